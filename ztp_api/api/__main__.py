@@ -11,6 +11,7 @@ from pathlib import Path
 from ztp_api.api.routers.entries import entries_router
 from ztp_api.api.routers.models import models_router
 from ztp_api.api.errors import validation_exception_handler
+from ztp_api.api.events import startup, shutdown
 
 
 ENV_VAR_PREFIX = 'ZTPAPI_'
@@ -56,6 +57,7 @@ def main():
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
     )
 
     app.include_router(entries_router, prefix='/entries', tags=['Entries'])
@@ -63,5 +65,8 @@ def main():
 
     app.add_exception_handler(RequestValidationError, validation_exception_handler)
 
+    app.add_event_handler('startup', startup)
+    app.add_event_handler('shutdown', shutdown)
+
     setproctitle(os.path.basename(sys.argv[0]))
     uvicorn.run(app=app, **uvicorn_params)
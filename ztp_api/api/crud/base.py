@@ -57,6 +57,18 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         await db.commit()
         return db_obj
 
+    async def create_multi(
+            self,
+            db: AsyncSession,
+            *,
+            objs_in: List[CreateSchemaType]
+    ) -> List[ModelType]:
+        db_objs = [self.model(**jsonable_encoder(obj_in))  # type: ignore
+                   for obj_in in objs_in]
+        db.add_all(db_objs)
+        await db.commit()
+        return db_objs
+
     async def update(self, db: AsyncSession, *, db_obj: ModelType, obj_in: Union[UpdateSchemaType, Dict[str, Any]]
     ) -> ModelType:
         obj_data = jsonable_encoder(db_obj)
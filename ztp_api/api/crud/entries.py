@@ -1,10 +1,121 @@
+import base64
+import binascii
+import datetime
+import ipaddress
+
+from sqlalchemy import tuple_, update
+from sqlalchemy.future import select
+from sqlalchemy.orm import joinedload
+
 from ztp_api.api.crud.base import CRUDBase
-from ztp_api.api.models.entries import Entry
-from ztp_api.api.schemas.entries import EntryCreateRequest, EntryPatchRequest
+from ztp_api.api.models.entries import Entry, ZTPStatus
+from ztp_api.api.schemas.entries import EntryCreateRequest, EntryListItem, \
+    EntryPatchRequest
+
+
+def encode_cursor(created_at: datetime.datetime, id: int) -> str:
+    raw = f'{created_at.isoformat()}|{id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, int]:
+    """Raises ValueError for a malformed cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    except (UnicodeError, binascii.Error) as exc:
+        raise ValueError(cursor) from exc
+    created_at, _, id = raw.partition('|')
+    return datetime.datetime.fromisoformat(created_at), int(id)
 
 
 class CRUDEntry(CRUDBase[Entry, EntryCreateRequest, EntryPatchRequest]):
-    pass
+    list_columns = [getattr(Entry, field) for field in EntryListItem.__fields__]
+
+    @staticmethod
+    def _filter(statement, *, status: ZTPStatus = None,
+                ip_address: ipaddress.IPv4Address = None,
+                serial_number: str = None,
+                employee_id: int = None,
+                created_from: datetime.datetime = None,
+                created_to: datetime.datetime = None):
+        if status:
+            statement = statement.where(Entry.status == status)
+        if ip_address:
+            statement = statement.where(Entry.ip_address == ip_address)
+        if serial_number:
+            statement = statement.where(Entry.serial_number == serial_number)
+        if employee_id:
+            statement = statement.where(Entry.employee_id == employee_id)
+        if created_from:
+            statement = statement.where(Entry.created_at >= created_from)
+        if created_to:
+            statement = statement.where(Entry.created_at < created_to)
+        return statement
+
+    async def get_page(
+            self,
+            db,
+            *,
+            limit: int = 100,
+            cursor: str = None,
+            status: ZTPStatus = None,
+            ip_address: ipaddress.IPv4Address = None,
+            serial_number: str = None,
+            employee_id: int = None,
+            created_from: datetime.datetime = None,
+            created_to: datetime.datetime = None,
+    ) -> tuple[list, str | None]:
+        """
+        Newest first, without the JSONB columns. Returns the rows and the
+        cursor of the next page (None on the last page).
+        """
+        statement = select(*self.list_columns)
+        if cursor:
+            statement = statement.where(
+                tuple_(Entry.created_at, Entry.id) < decode_cursor(cursor)
+            )
+        statement = self._filter(statement, status=status,
+                                 ip_address=ip_address,
+                                 serial_number=serial_number,
+                                 employee_id=employee_id,
+                                 created_from=created_from,
+                                 created_to=created_to)
+        statement = statement.order_by(Entry.created_at.desc(),
+                                       Entry.id.desc()).limit(limit + 1)
+        response = await db.execute(statement)
+        rows = response.all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        return rows, next_cursor
+
+    async def get_with_models(self, db, *, ids: list[int] = None,
+                              **filters) -> list[Entry]:
+        """Entries by id and/or filters with their models, in one query"""
+        statement = select(Entry).options(joinedload(Entry.model))
+        if ids is not None:
+            statement = statement.where(Entry.id.in_(ids))
+        statement = self._filter(statement, **filters).order_by(Entry.id)
+        response = await db.execute(statement)
+        return list(response.scalars())
+
+    async def transition_status(self, db, *, id: int,
+                                from_status: ZTPStatus,
+                                to_status: ZTPStatus,
+                                **values) -> bool:
+        """
+        Single UPDATE guarded by the current status. Returns False when the
+        entry is missing or not in ``from_status`` (e.g. already moved).
+        """
+        statement = update(Entry).where(
+            Entry.id == id,
+            Entry.status == from_status,
+        ).values(status=to_status, **values).returning(Entry.id)
+        statement = statement.execution_options(synchronize_session=False)
+        response = await db.execute(statement)
+        await db.commit()
+        return response.first() is not None
 
 
-entry = CRUDEntry(Entry)
\ No newline at end of file
+entry = CRUDEntry(Entry)
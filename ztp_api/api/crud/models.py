@@ -1,10 +1,15 @@
+from sqlalchemy.future import select
+
 from ztp_api.api.crud.base import CRUDBase
 from ztp_api.api.models.models import Model
 from ztp_api.api.schemas.models import ModelCreateRequest, ModelPatchRequest
 
 
 class CRUDEntry(CRUDBase[Model, ModelCreateRequest, ModelPatchRequest]):
-    pass
+    async def get_by_name(self, db, *, name: str) -> Model | None:
+        statement = select(Model).where(Model.model == name)
+        response = await db.execute(statement)
+        return response.scalars().first()
 
 
-model = CRUDEntry(Model)
\ No newline at end of file
+model = CRUDEntry(Model)
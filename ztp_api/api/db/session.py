@@ -1,13 +1,45 @@
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 
-def get_async_session(postgres_url: str):
+_engines: dict[str, AsyncEngine] = {}
+_sessions: dict[str, sessionmaker] = {}
+
+
+def create_engine_pool(postgres_url: str,
+                       pool_size: int = 5,
+                       max_overflow: int = 10,
+                       pool_pre_ping: bool = True,
+                       pool_recycle: int = 1800) -> sessionmaker:
+    postgres_url = str(postgres_url)
+    if postgres_url in _sessions:
+        return _sessions[postgres_url]
     engine = create_async_engine(
         postgres_url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=pool_pre_ping,
+        pool_recycle=pool_recycle,
     )
     async_session = sessionmaker(
         engine, expire_on_commit=False, class_=AsyncSession
     )
+    _engines[postgres_url] = engine
+    _sessions[postgres_url] = async_session
     return async_session
+
+
+def get_async_session(postgres_url: str) -> sessionmaker:
+    postgres_url = str(postgres_url)
+    if postgres_url not in _sessions:
+        return create_engine_pool(postgres_url)
+    return _sessions[postgres_url]
+
+
+async def dispose_engines() -> None:
+    engines = list(_engines.values())
+    _engines.clear()
+    _sessions.clear()
+    for engine in engines:
+        await engine.dispose()
@@ -1,15 +1,23 @@
 import celery
 
 from ztp_api.api.db.session import get_async_session
-from pyuserside.api.asynchronous import UsersideAPI
-import aiohttp
-from ztp_api.api.settings import Settings
+from ztp_api.api.settings import Settings, settings_provider
 from fastapi import Depends
-from ztp_api.api.services.tftp import TftpWrapper
+from ztp_api.api.services.catalog import ModelCatalog, get_model_catalog
+from ztp_api.api.services.http import get_client_session
+from ztp_api.api.services.ipam import IpAllocator, get_ip_allocator
+from ztp_api.api.services.kea import SubnetIdResolver, get_subnet_resolver
+from ztp_api.api.services.netbox import PrefixResolver, get_prefix_resolver
+from ztp_api.api.services.render import ConfigRenderer, get_config_renderer
+from ztp_api.api.services.templates import TemplateRepository, \
+    get_template_repository
+from ztp_api.api.services.tftp import AsyncTftpWrapper, get_tftp_client
+from ztp_api.api.services.userside import CachedUsersideAPI, \
+    get_userside_api
 
 
-def get_settings():
-    return Settings()
+def get_settings() -> Settings:
+    return settings_provider.get()
 
 
 async def get_db(settings: Settings = Depends(get_settings)):
@@ -30,38 +38,40 @@ async def get_kea_db(settings: Settings = Depends(get_settings)):
         await session.close()
 
 
-async def get_us_api(settings: Settings = Depends(get_settings)):
-    userside_url = settings.USERSIDE_URL
-    userside_key = settings.USERSIDE_KEY
-    usapi = UsersideAPI(url=userside_url, key=userside_key)
-    usapi._session = aiohttp.ClientSession()
-    try:
-        yield usapi
-    finally:
-        await usapi._session.close()
+def get_us_api() -> CachedUsersideAPI:
+    return get_userside_api()
 
 
-async def get_netbox_session(settings: Settings = Depends(get_settings)):
-    netbox_url = settings.NETBOX_URL
-    netbox_token = settings.NETBOX_TOKEN
-    auth_header = {'Authorization': f'Token {netbox_token}'}
-    session = aiohttp.ClientSession(base_url=netbox_url, headers=auth_header, connector=aiohttp.TCPConnector(verify_ssl=False))
-    try:
-        yield session
-    finally:
-        await session.close()
+def get_netbox_session():
+    return get_client_session('netbox')
 
 
-def get_tftp_session(settings: Settings = Depends(get_settings)):
-    tftp_server = settings.TFTP_SERVER
-    tftp_username = settings.TFTP_USERNAME
-    tftp_password = settings.TFTP_PASSWORD
-    ftp_session = TftpWrapper(tftp_server, tftp_username, tftp_password)
-    ftp_session.start()
-    try:
-        yield ftp_session
-    finally:
-        ftp_session.finish()
+def get_resolver() -> PrefixResolver:
+    return get_prefix_resolver()
+
+
+def get_subnets() -> SubnetIdResolver:
+    return get_subnet_resolver()
+
+
+def get_models() -> ModelCatalog:
+    return get_model_catalog()
+
+
+def get_allocator() -> IpAllocator:
+    return get_ip_allocator()
+
+
+def get_tftp_session() -> AsyncTftpWrapper:
+    return get_tftp_client()
+
+
+def get_renderer() -> ConfigRenderer:
+    return get_config_renderer()
+
+
+def get_templates() -> TemplateRepository:
+    return get_template_repository()
 
 
 def get_celery(settings=Depends(get_settings)):
@@ -72,10 +82,5 @@ def get_celery(settings=Depends(get_settings)):
         cel.close()
 
 
-async def get_deviceapi_session(settings: Settings = Depends(get_settings)):
-    deviceapi_url = settings.DEVICEAPI_URL
-    session = aiohttp.ClientSession(base_url=deviceapi_url, connector=aiohttp.TCPConnector(verify_ssl=False))
-    try:
-        yield session
-    finally:
-        await session.close()
+def get_deviceapi_session():
+    return get_client_session('deviceapi')
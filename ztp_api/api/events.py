@@ -0,0 +1,97 @@
+from ztp_api.api.db.session import create_engine_pool, dispose_engines
+from ztp_api.api.services.catalog import create_model_catalog
+from ztp_api.api.services.ipam import create_ip_allocator, \
+    close_ip_allocator
+from ztp_api.api.services.kea import create_subnet_resolver
+from ztp_api.api.services.http import create_client_session, \
+    close_client_sessions
+from ztp_api.api.services.netbox import create_prefix_resolver
+from ztp_api.api.services.render import create_config_renderer, \
+    close_config_renderer
+from ztp_api.api.services.templates import create_template_repository
+from ztp_api.api.services.tftp import create_tftp_client, close_tftp_client
+from ztp_api.api.services.userside import create_userside_api
+from ztp_api.api.settings import settings_provider
+
+
+async def startup():
+    settings = settings_provider.get()
+    if settings.SETTINGS_RELOAD:
+        settings_provider.watch(settings.SETTINGS_RELOAD_INTERVAL)
+    pool_options = {
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_pre_ping': settings.DB_POOL_PRE_PING,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+    }
+    project_sessionmaker = create_engine_pool(settings.PROJECT_DB,
+                                              **pool_options)
+    create_model_catalog(project_sessionmaker,
+                         ttl=settings.MODEL_CATALOG_TTL)
+    kea_sessionmaker = create_engine_pool(settings.DHCP_DB, **pool_options)
+    subnet_resolver = create_subnet_resolver(
+        kea_sessionmaker,
+        static_subnets=settings.KEA_SUBNETS,
+        ttl=settings.KEA_SUBNETS_TTL,
+    )
+    await subnet_resolver.refresh()
+    if subnet_resolver.empty:
+        raise RuntimeError('No Kea subnets: fill KEA_SUBNETS when Kea is '
+                           'not configured through its database')
+
+    http_options = {
+        'limit_per_host': settings.HTTP_LIMIT_PER_HOST,
+        'keepalive_timeout': settings.HTTP_KEEPALIVE_TIMEOUT,
+        'dns_cache_ttl': settings.HTTP_DNS_CACHE_TTL,
+    }
+    netbox = create_client_session(
+        'netbox',
+        base_url=settings.NETBOX_URL,
+        headers={'Authorization': f'Token {settings.NETBOX_TOKEN}'},
+        verify_ssl=False,
+        timeout=settings.HTTP_TIMEOUT,
+        **http_options,
+    )
+    create_prefix_resolver(netbox, ttl=settings.NETBOX_CACHE_TTL)
+    create_ip_allocator(netbox, project_sessionmaker,
+                        ledger_url=settings.IPAM_LEDGER_URL,
+                        hold=settings.IPAM_HOLD,
+                        reserve_in_netbox=settings.IPAM_RESERVE_IN_NETBOX,
+                        warm_pool_size=settings.IPAM_WARM_POOL_SIZE,
+                        warm_pool_ttl=settings.IPAM_WARM_POOL_TTL,
+                        fetch_limit=settings.IPAM_FETCH_LIMIT)
+    userside = create_client_session(
+        'userside',
+        timeout=settings.HTTP_TIMEOUT,
+        **http_options,
+    )
+    create_userside_api(settings.USERSIDE_URL, settings.USERSIDE_KEY,
+                        userside, ttls=settings.USERSIDE_CACHE_TTLS)
+    create_client_session(
+        'deviceapi',
+        base_url=settings.DEVICEAPI_URL,
+        verify_ssl=False,
+        timeout=settings.DEVICEAPI_TIMEOUT,
+        **http_options,
+    )
+
+    tftp = create_tftp_client(
+        settings.TFTP_SERVER,
+        settings.TFTP_USERNAME,
+        settings.TFTP_PASSWORD,
+        pool_size=settings.TFTP_POOL_SIZE,
+        listing_ttl=settings.TFTP_LISTING_TTL,
+    )
+    create_template_repository(tftp,
+                               maxsize=settings.TEMPLATE_CACHE_SIZE,
+                               ttl=settings.TEMPLATE_CACHE_TTL)
+    create_config_renderer(max_workers=settings.RENDER_WORKERS)
+
+
+async def shutdown():
+    settings_provider.stop()
+    await close_ip_allocator()
+    await close_config_renderer()
+    await close_tftp_client()
+    await close_client_sessions()
+    await dispose_engines()
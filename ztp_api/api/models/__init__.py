@@ -1,3 +1,3 @@
 from .entries import Entry
 from .models import Model
-from .kea_dhcp import Hosts, DHCPOptions
+from .kea_dhcp import Hosts, DHCPOptions, Subnets
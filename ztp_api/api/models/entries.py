@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Enum, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Enum, DateTime, Index, text
 from sqlalchemy.dialects.postgresql import INET, JSONB, MACADDR
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -38,4 +38,12 @@ class Entry(Base):
     modified_port_settings = Column('modified_port_settings', JSONB, nullable=True)
     vlan_settings = Column('vlan_settings', JSONB, nullable=True)
     modified_vlan_settings = Column('modified_vlan_settings', JSONB, nullable=True)
+    __table_args__ = (
+        Index('ix_entries_created_at_id', 'created_at', 'id'),
+        Index('ix_entries_ip_address', 'ip_address'),
+        Index('ix_entries_serial_number', 'serial_number'),
+        Index('ix_entries_employee_id', 'employee_id'),
+        Index('ix_entries_in_progress', 'created_at', 'id',
+              postgresql_where=text("status = 'IN_PROGRESS'")),
+    )
     __mapper_args__ = {"eager_defaults": True}
\ No newline at end of file
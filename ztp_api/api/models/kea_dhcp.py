@@ -35,3 +35,9 @@ class DHCPOptions(Base):
     host_id = Column('host_id', Integer)
     scope_id = Column('scope_id', SMALLINT, nullable=False)
     user_context = Column('user_context', TEXT)
+
+
+class Subnets(Base):
+    __tablename__ = 'dhcp4_subnet'
+    subnet_id = Column('subnet_id', BIGINT, primary_key=True, nullable=False)
+    subnet_prefix = Column('subnet_prefix', VARCHAR(64), nullable=False)
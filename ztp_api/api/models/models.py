@@ -7,7 +7,7 @@ from ztp_api.api.db.base import Base
 class Model(Base):
     __tablename__ = 'models'
     id = Column(Integer, primary_key=True)
-    model = Column(String)
+    model = Column(String, unique=True, index=True)
     portcount = Column(Integer)
     configuration_prefix = Column(String)
     default_initial_config = Column(String)
@@ -1,54 +1,98 @@
+import asyncio
 import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, \
+    Query, Response
+from fastapi.responses import StreamingResponse
 
 import ipaddress
 import re
 import logging
-from jinja2 import Template
 
 from ztp_api.api import crud, schemas, models
-from ztp_api.api.dependencies import get_db, get_us_api, get_netbox_session, \
+from ztp_api.api.dependencies import get_db, get_us_api, \
     get_kea_db, get_settings, \
-    get_tftp_session, get_celery, get_deviceapi_session
-from ztp_api.api.ztp.kea_dhcp import add_dhcp
+    get_tftp_session, get_celery, get_deviceapi_session, get_resolver, \
+    get_templates, get_subnets, get_models, get_allocator, get_renderer
+from ztp_api.api.services.catalog import ModelCatalog
+from ztp_api.api.services.ipam import IpAllocator
+from ztp_api.api.ztp.kea_dhcp import add_dhcp, add_dhcp_multi
+from ztp_api.api.ztp.snmp import collect_switch_settings
 from ztp_api.api.ztp.ztp import generate_initial_config
+from ztp_api.common.vlans import SwitchVlanState
+
+logger = logging.getLogger(__name__)
 
 entries_router = APIRouter()
 
 
-@entries_router.get('/', response_model=list[schemas.Entry])
-async def entries_list(skip: int = 0,
-                       limit: int = 100,
-                       order_by: str = 'id',
-                       status: str | None = None,
+@entries_router.get('/', response_model=list[schemas.EntryListItem])
+async def entries_list(response: Response,
+                       limit: int = Query(100, ge=1, le=1000),
+                       cursor: str | None = None,
+                       status: models.entries.ZTPStatus | None = None,
+                       ip_address: ipaddress.IPv4Address | None = None,
+                       serial_number: str | None = None,
+                       employee_id: int | None = None,
+                       created_from: datetime.datetime | None = None,
+                       created_to: datetime.datetime | None = None,
                        db=Depends(get_db)):
-    entries = await crud.entry.get_multi(db,
-                                         skip=skip,
-                                         limit=limit,
-                                         order_by=order_by,
-                                         status=status)
+    try:
+        entries, next_cursor = await crud.entry.get_page(
+            db,
+            limit=limit,
+            cursor=cursor,
+            status=status,
+            ip_address=ip_address,
+            serial_number=serial_number,
+            employee_id=employee_id,
+            created_from=created_from,
+            created_to=created_to,
+        )
+    except ValueError:
+        raise HTTPException(status_code=422, detail=[
+            {'field': 'cursor', 'msg': 'Некорректный курсор'}
+        ])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
     return entries
 
 
-@entries_router.post('/', response_model=schemas.Entry)
-async def entries_create(req: schemas.EntryCreateRequest,
-                         background_tasks: BackgroundTasks,
-                         db=Depends(get_db),
-                         kea_db=Depends(get_kea_db),
-                         us=Depends(get_us_api),
-                         nb=Depends(get_netbox_session),
-                         tftp=Depends(get_tftp_session),
-                         settings=Depends(get_settings)):
+def release_abandoned(allocator: IpAllocator, allocation: asyncio.Future):
+    if not allocation.cancelled() and allocation.exception() is None \
+            and allocation.result() is not None:
+        asyncio.ensure_future(allocator.release(allocation.result()))
+
+
+async def allocate_ip(allocator: IpAllocator, prefix_ids: list[int],
+                      description: str, field: str) -> str:
+    allocation = asyncio.ensure_future(
+        allocator.allocate(prefix_ids, description))
+    try:
+        new_ip = await asyncio.shield(allocation)
+    except asyncio.CancelledError:
+        # the claim may still land after we stop waiting, give it back then
+        allocation.add_done_callback(
+            lambda done: release_abandoned(allocator, done))
+        raise
+    if new_ip is None:
+        raise HTTPException(status_code=422, detail=[
+            {
+                'field': field,
+                'msg': 'Не получилось выбрать айпишник -- нет свободных.',
+            }
+        ]
+                            )
+    return new_ip
+
+
+def allocates_ip(req: schemas.EntryCreateRequest) -> bool:
+    return req.mount_type in ('newHouse', 'newSwitch')
+
+
+async def resolve_address(req: schemas.EntryCreateRequest, us, resolver,
+                          allocator: IpAllocator) -> dict:
     new_entry_object = {}
-    dirty_mac = req.mac_address
-    clean_mac = ''.join([character for character in dirty_mac.lower() if
-                         character in '0123456789abcdef'])
-    new_entry_object['serial_number'] = req.serial_number
-    new_entry_object['node_id'] = req.node_id
-    new_entry_object['mac_address'] = clean_mac
-    new_entry_object['employee_id'] = req.employee_id
-    new_entry_object['node_id'] = req.node_id
     mount_type = req.mount_type
     if mount_type == 'newHouse':
         new_entry_object['task_id'] = req.task_id
@@ -83,62 +127,36 @@ async def entries_create(req: schemas.EntryCreateRequest,
             ]
                                 )
         subnet = subnet.group(1)
-        async with nb.get('/api/ipam/prefixes/',
-                          params={'prefix': subnet}) as response:
-            answer = await response.json()
-            if len(answer['results']) == 0:
-                raise HTTPException(status_code=422, detail=[
-                    {
-                        'field': 'taskId',
-                        'msg': 'Указанная в заявке менеджмент сетка не ищется в нетбоксе',
-                    }
-                ]
-                                    )
-            prefixes = answer['results']
-            prefixes.sort(
-                key=lambda x: ipaddress.ip_network(x['prefix']).prefixlen,
-                reverse=True,
-            )
-            prefix_info = prefixes[0]
-            vlan_info = prefix_info.get('vlan')
-            if not vlan_info:
-                raise HTTPException(status_code=422, detail=[
-                    {
-                        'field': 'taskId',
-                        'msg': 'К указанной в заявке менеджмент сетке не привязан влан в нетбоксе',
-                    }
-                ]
-                                    )
-        async with nb.get('/api/ipam/prefixes/',
-                          params={'vlan_id': vlan_info['id']}) as response:
-            answer = await response.json()
-            if not answer.get('results'):
-                raise HTTPException(status_code=422, detail=[
-                    {
-                        'field': 'taskId',
-                        'msg': 'Невозможная ошибка: к влану не привязана ни одна сетка',
-                    }
-                ]
-                                    )
-            available_prefix_ids = [prefix['id'] for prefix in
-                                    answer['results']]
-        new_ip = None
-        for prefix_id in available_prefix_ids:
-            async with nb.get(
-                    f'/api/ipam/prefixes/{prefix_id}/available-ips/') as response:
-                answer = await response.json()
-                if answer:
-                    new_ip = answer[0]['address']
-                    new_ip = ipaddress.IPv4Interface(new_ip).ip.exploded
-                    break
-        if not new_ip:
+        prefix_info = await resolver.get_exact_prefix(subnet)
+        if not prefix_info:
             raise HTTPException(status_code=422, detail=[
                 {
                     'field': 'taskId',
-                    'msg': 'Не получилось выбрать айпишник -- нет свободных.',
+                    'msg': 'Указанная в заявке менеджмент сетка не ищется в нетбоксе',
                 }
             ]
                                 )
+        vlan_info = prefix_info.get('vlan')
+        if not vlan_info:
+            raise HTTPException(status_code=422, detail=[
+                {
+                    'field': 'taskId',
+                    'msg': 'К указанной в заявке менеджмент сетке не привязан влан в нетбоксе',
+                }
+            ]
+                                )
+        vlan_prefixes = await resolver.get_vlan_prefixes(vlan_info['id'])
+        if not vlan_prefixes:
+            raise HTTPException(status_code=422, detail=[
+                {
+                    'field': 'taskId',
+                    'msg': 'Невозможная ошибка: к влану не привязана ни одна сетка',
+                }
+            ]
+                                )
+        available_prefix_ids = [prefix['id'] for prefix in vlan_prefixes]
+        new_ip = await allocate_ip(allocator, available_prefix_ids,
+                                   f'ZTP {req.serial_number}', 'taskId')
         new_entry_object['ip_address'] = new_ip
     elif mount_type == 'newSwitch':
         if not req.ip_address:
@@ -157,62 +175,36 @@ async def entries_create(req: schemas.EntryCreateRequest,
                 }
             ]
                                 )
-        async with nb.get('/api/ipam/prefixes/', params={
-            'contains': req.ip_address.exploded}) as response:
-            answer = await response.json()
-            if len(answer['results']) == 0:
-                raise HTTPException(status_code=422,
-                                    detail=[
-                                        {'field': 'ip',
-                                         'msg': 'Сетка вышестоящего свича '
-                                                'не ищется в нетбоксе',}
-                                    ]
-                                    )
-            prefixes = answer['results']
-            prefixes.sort(
-                key=lambda x: ipaddress.ip_network(x['prefix']).prefixlen,
-                reverse=True,
-            )
-            prefix_info = prefixes[0]
-            vlan_info = prefix_info.get('vlan')
-            if not vlan_info:
-                raise HTTPException(status_code=422, detail=[
-                    {
-                        'field': 'ip',
-                        'msg': 'К сетке вышестоящего свича не привязан влан в нетбоксе',
-                    }
-                ]
-                                    )
-        async with nb.get('/api/ipam/prefixes/',
-                          params={'vlan_id': vlan_info['id']}) as response:
-            answer = await response.json()
-            if not answer.get('results'):
-                raise HTTPException(status_code=422, detail=[
-                    {
-                        'field': 'ip',
-                        'msg': 'Невозможная ошибка: к влану не привязана ни одна сетка',
-                    }
-                ]
-                                    )
-            available_prefix_ids = [prefix['id'] for prefix in
-                                    answer['results']]
-        new_ip = None
-        for prefix_id in available_prefix_ids:
-            async with nb.get(
-                    f'/api/ipam/prefixes/{prefix_id}/available-ips/') as response:
-                answer = await response.json()
-                if answer:
-                    new_ip = answer[0]['address']
-                    new_ip = ipaddress.IPv4Interface(new_ip).ip.exploded
-                    break
-        if not new_ip:
+        prefix_info = await resolver.get_prefix(req.ip_address.exploded)
+        if not prefix_info:
+            raise HTTPException(status_code=422,
+                                detail=[
+                                    {'field': 'ip',
+                                     'msg': 'Сетка вышестоящего свича '
+                                            'не ищется в нетбоксе',}
+                                ]
+                                )
+        vlan_info = prefix_info.get('vlan')
+        if not vlan_info:
             raise HTTPException(status_code=422, detail=[
                 {
                     'field': 'ip',
-                    'msg': 'Не получилось выбрать айпишник -- нет свободных.',
+                    'msg': 'К сетке вышестоящего свича не привязан влан в нетбоксе',
                 }
             ]
                                 )
+        vlan_prefixes = await resolver.get_vlan_prefixes(vlan_info['id'])
+        if not vlan_prefixes:
+            raise HTTPException(status_code=422, detail=[
+                {
+                    'field': 'ip',
+                    'msg': 'Невозможная ошибка: к влану не привязана ни одна сетка',
+                }
+            ]
+                                )
+        available_prefix_ids = [prefix['id'] for prefix in vlan_prefixes]
+        new_ip = await allocate_ip(allocator, available_prefix_ids,
+                                   f'ZTP {req.serial_number}', 'ip')
         new_entry_object['parent_switch'] = req.ip_address.exploded
         new_entry_object['parent_port'] = req.parent_port
         new_entry_object['ip_address'] = new_ip
@@ -279,11 +271,15 @@ async def entries_create(req: schemas.EntryCreateRequest,
                 new_entry_object['parent_switch'] = parent_switch
                 new_entry_object['parent_port'] = parent_port
         new_entry_object['ip_address'] = req.ip_address.exploded
-    new_entry_object['status'] = models.entries.ZTPStatus.WAITING
+    return new_entry_object
+
+
+async def resolve_model(req: schemas.EntryCreateRequest, us,
+                        catalog: ModelCatalog) -> models.Model:
     try:
         inventory_id = await us.inventory.get_inventory_id(
             data_typer='serial_number',
-            data_value=new_entry_object['serial_number'])
+            data_value=req.serial_number)
     except ValueError as exc:
         raise HTTPException(status_code=422, detail=[
             {
@@ -295,8 +291,7 @@ async def entries_create(req: schemas.EntryCreateRequest,
     inventory_id = inventory_id['id']
     inventory_data = await us.inventory.get_inventory(id=inventory_id)
     model_name = inventory_data['data']['name']
-    models_db = await crud.model.get_multi(db=db)
-    model = list(filter(lambda x: x.model == model_name, models_db))
+    model = await catalog.get(model_name)
     if not model:
         raise HTTPException(status_code=422, detail=[
             {
@@ -305,12 +300,46 @@ async def entries_create(req: schemas.EntryCreateRequest,
             }
         ]
                             )
-    model = model[0]
+    return model
+
+
+async def prepare_entry(req: schemas.EntryCreateRequest, us, resolver,
+                        catalog: ModelCatalog, allocator: IpAllocator):
+    new_entry_object = {}
+    dirty_mac = req.mac_address
+    clean_mac = ''.join([character for character in dirty_mac.lower() if
+                         character in '0123456789abcdef'])
+    new_entry_object['serial_number'] = req.serial_number
+    new_entry_object['node_id'] = req.node_id
+    new_entry_object['mac_address'] = clean_mac
+    new_entry_object['employee_id'] = req.employee_id
+    new_entry_object['node_id'] = req.node_id
+    address_task = asyncio.ensure_future(
+        resolve_address(req, us, resolver, allocator))
+    try:
+        model = await resolve_model(req, us, catalog)
+    except BaseException:
+        # cancel the address lookup; if it got that far, give its IP back
+        address_task.cancel()
+        address, = await asyncio.gather(address_task, return_exceptions=True)
+        if isinstance(address, dict) and allocates_ip(req):
+            await allocator.release(address['ip_address'])
+        raise
+    address = await address_task
+    new_entry_object.update(address)
+    try:
+        return await fill_entry_settings(new_entry_object, model, resolver)
+    except Exception:
+        if allocates_ip(req):
+            await allocator.release(address['ip_address'])
+        raise
+
+
+async def fill_entry_settings(new_entry_object: dict, model, resolver):
+    new_entry_object['status'] = models.entries.ZTPStatus.WAITING
     new_entry_object['model_id'] = model.id
 
-    async with nb.get('/api/ipam/prefixes/', params={'contains': new_entry_object['ip_address']}) as response:
-        results = await response.json()
-    prefix = max(results['results'], key=lambda x: int(x['prefix'].split('/')[1]))  # maybe use ip_interface.netmask
+    prefix = await resolver.get_prefix(new_entry_object['ip_address'])
     mgmt_vlan = prefix['vlan']
     empty_port_settings = {
         portnum: {'description': '',
@@ -331,15 +360,130 @@ async def entries_create(req: schemas.EntryCreateRequest,
     new_entry_object['original_port_settings'] = empty_port_settings
     new_entry_object['port_movements'] = {}
     new_entry_object['modified_port_settings'] = empty_port_settings
-    answer = await crud.entry.create(db, obj_in=new_entry_object)
-    background_tasks.add_task(add_dhcp, answer, kea_db, nb, settings,
-                              model.firmware)
-    background_tasks.add_task(generate_initial_config, answer, nb, tftp,
-                              settings, model.default_initial_config,
+    return new_entry_object, model
+
+
+@entries_router.post('/', response_model=schemas.Entry)
+async def entries_create(req: schemas.EntryCreateRequest,
+                         background_tasks: BackgroundTasks,
+                         db=Depends(get_db),
+                         kea_db=Depends(get_kea_db),
+                         subnets=Depends(get_subnets),
+                         us=Depends(get_us_api),
+                         resolver=Depends(get_resolver),
+                         catalog=Depends(get_models),
+                         allocator=Depends(get_allocator),
+                         tftp=Depends(get_tftp_session),
+                         templates=Depends(get_templates),
+                         settings=Depends(get_settings)):
+    new_entry_object, model = await prepare_entry(req, us, resolver,
+                                                  catalog, allocator)
+    try:
+        answer = await crud.entry.create(db, obj_in=new_entry_object)
+    except Exception:
+        if allocates_ip(req):
+            await allocator.release(new_entry_object['ip_address'])
+        raise
+    allocator.confirm(new_entry_object['ip_address'])
+    background_tasks.add_task(add_dhcp, answer, kea_db, resolver, subnets,
+                              settings, model.firmware)
+    background_tasks.add_task(generate_initial_config, answer, resolver, tftp,
+                              templates, settings,
+                              model.default_initial_config,
                               model.configuration_prefix, model.portcount)
     return answer
 
 
+@entries_router.post('/bulk', response_model=list[schemas.EntryBulkResult])
+async def entries_bulk_create(reqs: list[schemas.EntryCreateRequest],
+                              background_tasks: BackgroundTasks,
+                              db=Depends(get_db),
+                              kea_db=Depends(get_kea_db),
+                              subnets=Depends(get_subnets),
+                              us=Depends(get_us_api),
+                              resolver=Depends(get_resolver),
+                              catalog=Depends(get_models),
+                              allocator=Depends(get_allocator),
+                              tftp=Depends(get_tftp_session),
+                              templates=Depends(get_templates),
+                              settings=Depends(get_settings)):
+    semaphore = asyncio.Semaphore(settings.BULK_CONCURRENCY)
+
+    async def prepare(req):
+        async with semaphore:
+            try:
+                return await prepare_entry(req, us, resolver,
+                                           catalog, allocator)
+            except HTTPException as exc:
+                return exc
+            except Exception:
+                # details stay in the server log, not in the response
+                logger.exception('Failed to prepare entry %s',
+                                 req.serial_number)
+                return HTTPException(status_code=500, detail=[
+                    {
+                        'field': None,
+                        'msg': 'Внутренняя ошибка, подробности в логе',
+                    }
+                ])
+
+    def allocated_ips(items) -> list[str]:
+        return [new_entry_object['ip_address']
+                for index, (new_entry_object, _) in items
+                if allocates_ip(reqs[index])]
+
+    async def release(ips: list[str]) -> None:
+        await asyncio.gather(*[allocator.release(ip) for ip in ips],
+                             return_exceptions=True)
+
+    tasks = [asyncio.ensure_future(prepare(req)) for req in reqs]
+    try:
+        prepared = await asyncio.gather(*tasks)
+    except BaseException:
+        # the request was aborted: give back what was already claimed
+        for task in tasks:
+            task.cancel()
+        await release(allocated_ips(
+            (index, task.result()) for index, task in enumerate(tasks)
+            if task.done() and not task.cancelled()
+            and isinstance(task.result(), tuple)
+        ))
+        raise
+
+    results = [schemas.EntryBulkResult(index=index)
+               for index in range(len(reqs))]
+    to_create = []
+    for index, item in enumerate(prepared):
+        if isinstance(item, HTTPException):
+            results[index].errors = item.detail
+        else:
+            to_create.append((index, item))
+    allocated = allocated_ips(to_create)
+    try:
+        created = await crud.entry.create_multi(
+            db,
+            objs_in=[new_entry_object for _, (new_entry_object, _) in to_create]
+        )
+    except BaseException:
+        await release(allocated)
+        raise
+    for ip in allocated:
+        allocator.confirm(ip)
+    background_tasks.add_task(
+        add_dhcp_multi,
+        [(answer, model.firmware)
+         for (_, (_, model)), answer in zip(to_create, created)],
+        kea_db, resolver, subnets, settings,
+    )
+    for (index, (_, model)), answer in zip(to_create, created):
+        results[index].entry = schemas.Entry.from_orm(answer)
+        background_tasks.add_task(generate_initial_config, answer, resolver,
+                                  tftp, templates, settings,
+                                  model.default_initial_config,
+                                  model.configuration_prefix, model.portcount)
+    return results
+
+
 @entries_router.get('/{entry_id}/', response_model=schemas.Entry)
 async def entries_read(entry_id: int, db=Depends(get_db)):
     entry = await crud.entry.get(db=db, id=entry_id)
@@ -364,14 +508,9 @@ async def entries_delete(entry_id: int, db=Depends(get_db)):
 async def entries_ztp_start(entry_id: int,
                             db=Depends(get_db),
                             cel=Depends(get_celery),
-                            nb=Depends(get_netbox_session)):
+                            resolver=Depends(get_resolver)):
     entry = await crud.entry.get(db=db, id=entry_id)
-    async with nb.get('/api/ipam/prefixes/', params={
-        'contains': entry.ip_address.exploded}) as response:
-        answer = await response.json()
-    prefix_list = answer['results']
-    prefix_list.sort(key=lambda x: ipaddress.ip_network(x['prefix']).prefixlen)
-    prefix_info = prefix_list[-1]
+    prefix_info = await resolver.get_prefix(entry.ip_address.exploded)
     vlan_info = prefix_info.get('vlan')
     vlan_id = vlan_info['vid']
     task = cel.send_task(
@@ -379,7 +518,8 @@ async def entries_ztp_start(entry_id: int,
         (entry.ip_address.exploded, entry.autochange_vlans,
          entry.parent_switch.exploded if entry.parent_switch else None,
          entry.parent_port,
-         vlan_id)
+         vlan_id),
+        kwargs={'entry_id': entry.id},
     )
     answer = await crud.entry.update(
         db=db,
@@ -396,106 +536,48 @@ async def entries_ztp_start(entry_id: int,
 @entries_router.post('/{entry_id}/stop_ztp')
 async def entries_ztp_stop(entry_id: int,
                            db=Depends(get_db),
-                           cel=Depends(get_celery)):
+                           cel=Depends(get_celery),
+                           settings=Depends(get_settings)):
     entry = await crud.entry.get(db=db, id=entry_id)
     celery_task_id = entry.celery_id
-    cel.control.revoke(celery_task_id, terminate=True)
+    cel.control.revoke(celery_task_id,
+                       terminate=settings.ZTP_STOP_TERMINATE)
     answer = await crud.entry.update(db=db, db_obj=entry,
                                      obj_in={'celery_id': None})
     return answer
 
 
+@entries_router.post('/{entry_id}/finish_ztp', response_model=schemas.Entry)
+async def entries_ztp_finish(entry_id: int, db=Depends(get_db)):
+    await crud.entry.transition_status(
+        db,
+        id=entry_id,
+        from_status=models.entries.ZTPStatus.IN_PROGRESS,
+        to_status=models.entries.ZTPStatus.DONE,
+        celery_id=None,
+        finished_at=datetime.datetime.now(),
+    )
+    entry = await crud.entry.get(db=db, id=entry_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=[
+            {'field': 'entry_id', 'msg': 'Запись не найдена'}
+        ])
+    return entry
+
+
 @entries_router.post('/{entry_id}/collect_settings')
 async def entries_collect_settings(entry_id: int, db=Depends(get_db),
                                    da=Depends(get_deviceapi_session)):
-    def hex_to_portlist(hexstring: str) -> list[int]:
-        return [index
-                for index, value
-                in enumerate(''.join([
-                    bin(int(char, 16))[2:].zfill(4)
-                    for char in hexstring
-                ]), 1)
-                if value == '1']
-
     entry = await crud.entry.get(db=db, id=entry_id)
-    port_schema = entry.original_port_settings
-
-    async with da:
-        descriptions = []
-        current_portnum = 1
-        while True:
-            async with da.get(
-                    '/snmp/v2/get',
-                    params={'ip': entry.ip_address.exploded,
-                            'oid': f'1.3.6.1.2.1.31.1.1.1.18.{current_portnum}'}
-            ) as response:
-                response = await response.json()
-                response = response['response'][0]
-                oid = response['oid']
-                value = response['value']
-            if value == 'No Such Instance currently exists at this OID':
-                break
-            descriptions.append({'oid': oid, 'value': value})
-            current_portnum += 1
-
-
-        async with da.get(
-                '/snmp/v2/walk',
-                params={'ip': entry.ip_address.exploded,
-                        'oid': '1.3.6.1.2.1.17.7.1.4.3.1.1'}
-        ) as response:
-            vlan_names = await response.json()
-
-        async with da.get(
-                '/snmp/v2/walk',
-                params={'ip': entry.ip_address.exploded,
-                        'oid': '1.3.6.1.2.1.17.7.1.4.3.1.2'}
-        ) as response:
-            all_ports = await response.json()
-
-        async with da.get(
-                '/snmp/v2/walk',
-                params={'ip': entry.ip_address.exploded,
-                        'oid': '1.3.6.1.2.1.17.7.1.4.3.1.4'}
-        ) as response:
-            untagged_ports = await response.json()
-
-    untagged_ports = {
-        int(entry['oid'].split('.')[-1]): hex_to_portlist(entry['value'][2:])
-        for entry in untagged_ports['response']
-    }
+    port_schema = {int(port): settings for port, settings
+                   in (entry.original_port_settings or {}).items()}
 
-    tagged_ports = {
-        int(entry['oid'].split('.')[-1]): hex_to_portlist(entry['value'][2:])
-        for entry in all_ports['response']
-    }
-    tagged_ports = {
-        vlan_id: [port for port in portlist if
-                  port not in untagged_ports[vlan_id]]
-        for vlan_id, portlist in tagged_ports.items()
-    }
+    descriptions, vlan_names, all_ports, untagged_ports = \
+        await collect_switch_settings(da, entry.ip_address.exploded)
 
-    vlan_schema = {
-        int(entry['oid'].split('.')[-1]): entry['value']
-        for entry in vlan_names['response']
-    }
-
-    current_port = 0
-
-    for response in descriptions:
-        if int(response['oid'].split('.')[-1]) - current_port != 1:
-            break
-        current_port += 1
-        description = response['value']
-        port_schema[current_port] = {'description': '', 'tagged': [],
-                                     'untagged': []}
-        port_schema[current_port]['description'] = description
-        port_schema[current_port]['tagged'] = list(
-            filter(lambda x: current_port in tagged_ports[x],
-                   tagged_ports.keys()))
-        port_schema[current_port]['untagged'] = list(
-            filter(lambda x: current_port in untagged_ports[x],
-                   untagged_ports.keys()))
+    state = SwitchVlanState.from_walks(all_ports, untagged_ports, vlan_names)
+    port_schema.update(state.port_settings(descriptions))
+    vlan_schema = state.vlan_settings()
 
     answer = await crud.entry.update(db=db, db_obj=entry, obj_in={
         'original_port_settings': port_schema,
@@ -507,39 +589,112 @@ async def entries_collect_settings(entry_id: int, db=Depends(get_db),
     return answer
 
 
+def full_config_variables(entry, portcount: int, prefix: dict) -> dict:
+    return {
+        'portcount': portcount,
+        'management_vlan_tag': prefix['vlan']['vid'],
+        'port_settings': entry.modified_port_settings,
+        'vlan_settings': entry.modified_vlan_settings,
+        'ip_address': entry.ip_address.exploded,
+    }
+
+
+async def render_full_config(entry, model, resolver, templates, renderer,
+                             templates_folder: str) -> str:
+    """Template source from the repository cache, compiled and rendered in
+    the render pool (compiled templates are cached per worker)"""
+    source = await templates.get_source(model.default_full_config,
+                                        templates_folder)
+    prefix = await resolver.get_prefix(entry.ip_address.exploded)
+    return await renderer.render(
+        source, full_config_variables(entry, model.portcount, prefix),
+        trim_blocks=True)
+
+
 @entries_router.post('/{entry_id}/generate_full_config')
 async def generate_full_config(entry_id: int,
                                db=Depends(get_db),
-                               kea_db=Depends(get_kea_db),
-                               us=Depends(get_us_api),
-                               nb=Depends(get_netbox_session),
+                               resolver=Depends(get_resolver),
                                tftp=Depends(get_tftp_session),
+                               templates=Depends(get_templates),
+                               renderer=Depends(get_renderer),
                                settings=Depends(get_settings)):
     entry = await crud.entry.get(db=db, id=entry_id)
-    async with nb.get('/api/ipam/prefixes/', params={'contains': entry.ip_address.exploded}) as response:
-        results = await response.json()
-    prefix = max(results['results'], key=lambda x: int(x['prefix'].split('/')[1]))
-    management_vlan_tag = prefix['vlan']['vid']
     model = await crud.model.get(db=db, id=entry.model_id)
-    portcount = model.portcount
-    port_settings = entry.modified_port_settings
-    vlan_settings = entry.modified_vlan_settings
-    ip_address = entry.ip_address.exploded
-    config_variables = {
-        'portcount': portcount,
-        'management_vlan_tag': management_vlan_tag,
-        'port_settings': port_settings,
-        'vlan_settings': vlan_settings,
-        'ip_address': ip_address,
-    }
     templates_folder = settings.TFTP_FOLDER_STRUCTURE['templates_full']
-    template_file = tftp.download(model.default_full_config, templates_folder)
-    template = Template(template_file, trim_blocks=True)
-
-    full_config = template.render(**config_variables)
+    full_config = await render_full_config(entry, model, resolver, templates,
+                                           renderer, templates_folder)
 
     configuration_filename = entry.ip_address.exploded + '.cfg'
     configuration_folder = settings.TFTP_FOLDER_STRUCTURE['configs_full']
-    tftp.upload(configuration_filename, full_config, configuration_folder)
+    await tftp.upload(configuration_filename, full_config,
+                      configuration_folder)
 
     return full_config
+
+
+@entries_router.post('/generate_full_configs')
+async def generate_full_configs(req: schemas.FullConfigsRequest,
+                                db=Depends(get_db),
+                                resolver=Depends(get_resolver),
+                                tftp=Depends(get_tftp_session),
+                                templates=Depends(get_templates),
+                                renderer=Depends(get_renderer),
+                                settings=Depends(get_settings)):
+    """Streams one FullConfigResult per line (NDJSON) as entries finish"""
+    filters = req.dict(exclude={'ids'}, exclude_none=True)
+    if req.ids is None and not filters:
+        raise HTTPException(status_code=422, detail=[
+            {
+                'field': 'ids',
+                'msg': 'Нужен список id или хотя бы один фильтр',
+            }
+        ]
+                            )
+    if 'status' in filters:
+        filters['status'] = models.entries.ZTPStatus(filters['status'])
+    entries = await crud.entry.get_with_models(db, ids=req.ids, **filters)
+    missing = set(req.ids or []) - {entry.id for entry in entries}
+
+    templates_folder = settings.TFTP_FOLDER_STRUCTURE['templates_full']
+    configuration_folder = settings.TFTP_FOLDER_STRUCTURE['configs_full']
+    # warm the repository once per template before the entries race for it
+    await asyncio.gather(
+        *[templates.get_source(name, templates_folder)
+          for name in {entry.model.default_full_config for entry in entries}],
+        return_exceptions=True,
+    )
+    semaphore = asyncio.Semaphore(settings.BULK_CONCURRENCY)
+
+    async def generate(entry) -> schemas.FullConfigResult:
+        result = schemas.FullConfigResult(id=entry.id,
+                                          ip_address=entry.ip_address)
+        filename = entry.ip_address.exploded + '.cfg'
+        try:
+            async with semaphore:
+                full_config = await render_full_config(
+                    entry, entry.model, resolver, templates, renderer,
+                    templates_folder)
+                await tftp.upload(filename, full_config, configuration_folder)
+        except Exception as exc:
+            result.errors = [{'field': 'id', 'msg': str(exc)}]
+        else:
+            result.filename = filename
+        return result
+
+    async def stream():
+        for entry_id in sorted(missing):
+            result = schemas.FullConfigResult(
+                id=entry_id,
+                errors=[{'field': 'id', 'msg': 'Запись не найдена'}])
+            yield result.json() + '\n'
+        tasks = [asyncio.ensure_future(generate(entry)) for entry in entries]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield (await task).json() + '\n'
+        finally:
+            # the client went away, nothing to report to
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type='application/x-ndjson')
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Query, Depends
+from fastapi import APIRouter, Query, Depends, HTTPException
 from ztp_api.api import crud, schemas, models
-from ztp_api.api.dependencies import get_db
+from ztp_api.api.dependencies import get_db, get_models
 
 models_router = APIRouter()
 
@@ -12,8 +12,14 @@ async def models_list(skip: int = 0, limit: int = 100, db=Depends(get_db)):
 
 
 @models_router.post('/', response_model=schemas.Model)
-async def models_create(req: schemas.ModelCreateRequest, db=Depends(get_db)):
+async def models_create(req: schemas.ModelCreateRequest, db=Depends(get_db),
+                        catalog=Depends(get_models)):
+    if await crud.model.get_by_name(db, name=req.model):
+        raise HTTPException(status_code=422, detail=[
+            {'field': 'model', 'msg': f'Модель {req.model} уже добавлена'}
+        ])
     answer = await crud.model.create(db, obj_in=req)
+    catalog.invalidate()
     return answer
 
 
@@ -29,6 +35,8 @@ async def models_partial_update(req: schemas.ModelPatchRequest):
 
 
 @models_router.delete('/{model_id}/')
-async def models_delete(model_id: int, db=Depends(get_db)):
+async def models_delete(model_id: int, db=Depends(get_db),
+                        catalog=Depends(get_models)):
     answer = await crud.model.remove(db, id=model_id)
+    catalog.invalidate()
     return answer
@@ -1,2 +1,3 @@
-from .entries import NewHouseData, NewSwitchData, ChangeSwitchData, EntryCreateRequest, EntryPatchRequest, Entry
+from .entries import NewHouseData, NewSwitchData, ChangeSwitchData, EntryCreateRequest, EntryPatchRequest, Entry, \
+    EntryBulkResult, EntryListItem, FullConfigsRequest, FullConfigResult
 from .models import Model, ModelCreateRequest, ModelPatchRequest
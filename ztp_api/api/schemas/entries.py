@@ -90,3 +90,47 @@ class Entry(BaseModel):
     class Config:
         orm_mode = True
 
+
+class EntryListItem(BaseModel):
+    id: int
+    created_at: datetime.datetime
+    started_at: datetime.datetime = None
+    finished_at: datetime.datetime = None
+    status: Any = None
+    celery_id: str = None
+    employee_id: int
+    node_id: int
+    serial_number: str
+    model_id: int
+    mac_address: str
+    ip_address: ipaddress.IPv4Address
+    task_id: int = None
+    parent_switch: ipaddress.IPv4Address = None
+    parent_port: int = None
+    autochange_vlans: bool = False
+
+    class Config:
+        orm_mode = True
+
+
+class EntryBulkResult(BaseModel):
+    index: int
+    entry: Entry = None
+    errors: list[dict] = None
+
+
+class FullConfigsRequest(BaseModel):
+    ids: list[int] = None
+    status: Literal['WAITING', 'IN_PROGRESS', 'DONE'] = None
+    ip_address: ipaddress.IPv4Address = None
+    serial_number: str = None
+    employee_id: int = None
+    created_from: datetime.datetime = None
+    created_to: datetime.datetime = None
+
+
+class FullConfigResult(BaseModel):
+    id: int
+    ip_address: ipaddress.IPv4Address = None
+    filename: str = None
+    errors: list[dict] = None
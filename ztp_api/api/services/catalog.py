@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from ztp_api.api import crud
+from ztp_api.api.models.models import Model
+
+
+class ModelCatalog:
+    """
+    Hardware models by name. The whole table is kept in a dict that the
+    /models endpoints invalidate; names missing from it fall back to an
+    indexed lookup, so models added elsewhere are found before ``ttl``.
+    """
+
+    def __init__(self, db_sessionmaker: sessionmaker, ttl: float = 300):
+        self.db_sessionmaker = db_sessionmaker
+        self.ttl = ttl
+        self._by_name: dict[str, Model] = {}
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    async def _ensure_loaded(self):
+        async with self._lock:
+            if self._loaded_at is not None and \
+                    time.monotonic() - self._loaded_at <= self.ttl:
+                return
+            async with self.db_sessionmaker() as db:
+                models_db = await crud.model.get_multi(db, limit=None)
+            self._by_name = {model.model: model for model in models_db}
+            self._loaded_at = time.monotonic()
+
+    async def get(self, name: str) -> Model | None:
+        await self._ensure_loaded()
+        model = self._by_name.get(name)
+        if model is None:
+            async with self.db_sessionmaker() as db:
+                model = await crud.model.get_by_name(db, name=name)
+            if model is not None:
+                self._by_name[name] = model
+        return model
+
+
+_catalog: ModelCatalog | None = None
+
+
+def create_model_catalog(db_sessionmaker: sessionmaker,
+                         ttl: float = 300) -> ModelCatalog:
+    global _catalog
+    _catalog = ModelCatalog(db_sessionmaker, ttl=ttl)
+    return _catalog
+
+
+def get_model_catalog() -> ModelCatalog:
+    return _catalog
@@ -0,0 +1,42 @@
+import aiohttp
+
+
+_sessions: dict[str, aiohttp.ClientSession] = {}
+
+
+def create_client_session(name: str,
+                          base_url: str = None,
+                          headers: dict[str, str] = None,
+                          verify_ssl: bool = True,
+                          limit_per_host: int = 10,
+                          keepalive_timeout: float = 30,
+                          dns_cache_ttl: int = 300,
+                          timeout: float = 30) -> aiohttp.ClientSession:
+    if name in _sessions:
+        return _sessions[name]
+    connector = aiohttp.TCPConnector(
+        verify_ssl=verify_ssl,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=keepalive_timeout,
+        use_dns_cache=True,
+        ttl_dns_cache=dns_cache_ttl,
+    )
+    session = aiohttp.ClientSession(
+        base_url=base_url,
+        headers=headers,
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    )
+    _sessions[name] = session
+    return session
+
+
+def get_client_session(name: str) -> aiohttp.ClientSession:
+    return _sessions[name]
+
+
+async def close_client_sessions() -> None:
+    sessions = list(_sessions.values())
+    _sessions.clear()
+    for session in sessions:
+        await session.close()
@@ -0,0 +1,232 @@
+import asyncio
+import ipaddress
+import logging
+import time
+
+import aiohttp
+from redis import asyncio as aioredis
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from ztp_api.api.models.entries import Entry, ZTPStatus
+
+
+logger = logging.getLogger(__name__)
+
+# NetBox answers 409 (older releases 204) when a prefix has no free address
+NETBOX_PREFIX_FULL = (204, 409)
+
+
+class IpAllocator:
+    """
+    Management addresses from NetBox prefixes.
+
+    By default free addresses of all candidate prefixes are fetched
+    concurrently, addresses of unfinished entries are skipped, and the
+    chosen address is claimed in a ledger (local, or Redis for several
+    API instances) for ``hold`` seconds, so concurrent creates never get
+    the same one. ``warm_pool_size`` keeps that many prefetched
+    candidates per prefix set for ``warm_pool_ttl`` seconds; a pooled
+    address is checked against unfinished entries again when taken.
+
+    With ``reserve_in_netbox`` the address is instead created in NetBox
+    through POST available-ips, which NetBox serialises per prefix.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession,
+                 db_sessionmaker: sessionmaker,
+                 ledger_url: str = None,
+                 hold: int = 3600,
+                 reserve_in_netbox: bool = False,
+                 warm_pool_size: int = 0,
+                 warm_pool_ttl: float = 30,
+                 fetch_limit: int = 32):
+        self.session = session
+        self.db_sessionmaker = db_sessionmaker
+        self.hold = hold
+        self.reserve_in_netbox = reserve_in_netbox
+        self.warm_pool_size = warm_pool_size
+        self.warm_pool_ttl = warm_pool_ttl
+        self.fetch_limit = fetch_limit
+        self.redis = aioredis.from_url(ledger_url) if ledger_url else None
+        self._claims: dict[str, float] = {}
+        self._netbox_ids: dict[str, int] = {}
+        self._pools: dict[tuple[int, ...], tuple[float, list[str]]] = {}
+        self._refills: dict[tuple[int, ...], asyncio.Task] = {}
+
+    async def _claim(self, ip: str) -> bool:
+        if self.redis is not None:
+            return bool(await self.redis.set(f'ztp:ip:{ip}', 1, nx=True,
+                                             ex=self.hold))
+        now = time.monotonic()
+        if self._claims.get(ip, 0) > now:
+            return False
+        self._claims[ip] = now + self.hold
+        if len(self._claims) > 4096:
+            self._claims = {claimed: expires
+                            for claimed, expires in self._claims.items()
+                            if expires > now}
+        return True
+
+    async def _fetch_free(self, prefix_id: int, limit: int) -> list[str]:
+        async with self.session.get(
+                f'/api/ipam/prefixes/{prefix_id}/available-ips/',
+                params={'limit': limit}) as response:
+            response.raise_for_status()
+            answer = await response.json()
+        return [ipaddress.IPv4Interface(address['address']).ip.exploded
+                for address in answer]
+
+    async def _busy(self, candidates: list[str]) -> set[str]:
+        if not candidates:
+            return set()
+        async with self.db_sessionmaker() as db:
+            response = await db.execute(
+                select(Entry.ip_address).where(
+                    Entry.ip_address.in_(candidates),
+                    Entry.status != ZTPStatus.DONE,
+                )
+            )
+            return {ipaddress.ip_interface(str(ip)).ip.exploded
+                    for ip in response.scalars()}
+
+    async def _candidates(self, prefix_ids: list[int],
+                          limit: int) -> list[tuple[list[str], bool]]:
+        """Free addresses of every prefix and whether its page was full"""
+        pages = await asyncio.gather(*[self._fetch_free(prefix_id, limit)
+                                       for prefix_id in prefix_ids])
+        busy = await self._busy([ip for page in pages for ip in page])
+        return [([ip for ip in page if ip not in busy], len(page) >= limit)
+                for page in pages]
+
+    async def _take(self, candidates: list[str]) -> str | None:
+        for ip in candidates:
+            if await self._claim(ip):
+                return ip
+        return None
+
+    async def _refill(self, key: tuple[int, ...]) -> None:
+        try:
+            pages = await self._candidates(list(key), self.warm_pool_size)
+            pool = []
+            for candidates, full in pages:
+                pool.extend(candidates)
+                # later prefixes are only used once this one is exhausted
+                if full:
+                    break
+            self._pools[key] = (time.monotonic() + self.warm_pool_ttl, pool)
+        except Exception:
+            logger.exception('Failed to prefetch addresses for %s', key)
+
+    def _schedule_refill(self, key: tuple[int, ...]) -> None:
+        if not self.warm_pool_size:
+            return
+        task = self._refills.get(key)
+        if task is None or task.done():
+            self._refills[key] = asyncio.create_task(self._refill(key))
+
+    async def _allocate_from_ledger(self, prefix_ids: list[int]) -> str | None:
+        key = tuple(prefix_ids)
+        expires, pool = self._pools.get(key, (0, []))
+        if expires < time.monotonic():
+            # stale: NetBox may have handed these out meanwhile
+            self._pools.pop(key, None)
+            pool = []
+        while pool:
+            ip = pool.pop(0)
+            if await self._busy([ip]):
+                continue
+            if await self._claim(ip):
+                if len(pool) < self.warm_pool_size // 2:
+                    self._schedule_refill(key)
+                return ip
+        limit = self.fetch_limit
+        while prefix_ids:
+            pages = await self._candidates(prefix_ids, limit)
+            for index, (candidates, full) in enumerate(pages):
+                ip = await self._take(candidates)
+                if ip is not None:
+                    self._schedule_refill(key)
+                    return ip
+                if full:
+                    # this prefix may have more further on, look deeper
+                    prefix_ids = prefix_ids[index:]
+                    limit *= 4
+                    break
+            else:
+                return None
+        return None
+
+    async def _allocate_in_netbox(self, prefix_ids: list[int],
+                                  description: str) -> str | None:
+        for prefix_id in prefix_ids:
+            async with self.session.post(
+                    f'/api/ipam/prefixes/{prefix_id}/available-ips/',
+                    json={'status': 'reserved',
+                          'description': description}) as response:
+                if response.status in NETBOX_PREFIX_FULL:
+                    continue
+                # auth, permission or server errors are not "no free IPs"
+                response.raise_for_status()
+                if response.status != 201:
+                    raise aiohttp.ClientResponseError(
+                        response.request_info, response.history,
+                        status=response.status,
+                        message='Unexpected NetBox answer')
+                answer = await response.json()
+            ip = ipaddress.IPv4Interface(answer['address']).ip.exploded
+            self._netbox_ids[ip] = answer['id']
+            await self._claim(ip)
+            return ip
+        return None
+
+    async def allocate(self, prefix_ids: list[int],
+                       description: str = '') -> str | None:
+        """Free address from the first prefix that has one, or None"""
+        if self.reserve_in_netbox:
+            return await self._allocate_in_netbox(prefix_ids, description)
+        return await self._allocate_from_ledger(prefix_ids)
+
+    async def release(self, ip: str) -> None:
+        """Give back an address whose entry was not created"""
+        if self.redis is not None:
+            await self.redis.delete(f'ztp:ip:{ip}')
+        else:
+            self._claims.pop(ip, None)
+        netbox_id = self._netbox_ids.pop(ip, None)
+        if netbox_id is not None:
+            async with self.session.delete(
+                    f'/api/ipam/ip-addresses/{netbox_id}/') as response:
+                await response.read()
+
+    def confirm(self, ip: str) -> None:
+        """The entry with this address was stored"""
+        self._netbox_ids.pop(ip, None)
+
+    async def close(self) -> None:
+        for task in self._refills.values():
+            task.cancel()
+        if self.redis is not None:
+            await self.redis.close()
+
+
+_allocator: IpAllocator | None = None
+
+
+def create_ip_allocator(session: aiohttp.ClientSession,
+                        db_sessionmaker: sessionmaker,
+                        **options) -> IpAllocator:
+    global _allocator
+    _allocator = IpAllocator(session, db_sessionmaker, **options)
+    return _allocator
+
+
+def get_ip_allocator() -> IpAllocator:
+    return _allocator
+
+
+async def close_ip_allocator() -> None:
+    global _allocator
+    if _allocator is not None:
+        await _allocator.close()
+        _allocator = None
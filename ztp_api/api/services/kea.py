@@ -0,0 +1,123 @@
+import asyncio
+import bisect
+import ipaddress
+import logging
+import time
+
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from ztp_api.api.models.kea_dhcp import Subnets
+
+
+logger = logging.getLogger(__name__)
+
+
+class SubnetIdResolver:
+    """
+    Kea subnet id for an address, by longest prefix match over subnets
+    from the Kea ``dhcp4_subnet`` table and the KEA_SUBNETS setting. The
+    table is authoritative: the setting only adds prefixes Kea lacks.
+    Subnets are flattened into sorted non-overlapping integer ranges and
+    looked up with bisect.
+    """
+
+    def __init__(self, kea_sessionmaker: sessionmaker,
+                 static_subnets: dict[str, int] = None, ttl: float = 300):
+        self.kea_sessionmaker = kea_sessionmaker
+        self.static_subnets = static_subnets or {}
+        self.ttl = ttl
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        self._ids: list[int] = []
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    async def _fetch(self) -> dict[str, int]:
+        try:
+            async with self.kea_sessionmaker() as kea_db:
+                response = await kea_db.execute(
+                    select(Subnets.subnet_prefix, Subnets.subnet_id)
+                )
+                return {prefix: subnet_id for prefix, subnet_id in response}
+        except DBAPIError:
+            logger.exception('Failed to load Kea subnets, '
+                             'using KEA_SUBNETS only')
+            return {}
+
+    def _build(self, subnets: dict[str, int]) -> None:
+        networks = {ipaddress.IPv4Network(prefix, strict=False): subnet_id
+                    for prefix, subnet_id in subnets.items()}
+        points = sorted(
+            {int(network.network_address) for network in networks} |
+            {int(network.broadcast_address) + 1 for network in networks}
+        )
+        starts, ends, ids = [], [], []
+        for start, next_start in zip(points, points[1:]):
+            covering = [network for network in networks
+                        if int(network.network_address) <= start
+                        <= int(network.broadcast_address)]
+            if not covering:
+                continue
+            subnet_id = networks[max(covering, key=lambda x: x.prefixlen)]
+            if ids and ids[-1] == subnet_id and ends[-1] + 1 == start:
+                ends[-1] = next_start - 1
+                continue
+            starts.append(start)
+            ends.append(next_start - 1)
+            ids.append(subnet_id)
+        self._starts, self._ends, self._ids = starts, ends, ids
+
+    async def refresh(self) -> None:
+        fetched = await self._fetch()
+        known = {ipaddress.IPv4Network(prefix, strict=False): subnet_id
+                 for prefix, subnet_id in fetched.items()}
+        subnets = {}
+        for prefix, subnet_id in self.static_subnets.items():
+            network = ipaddress.IPv4Network(prefix, strict=False)
+            if network not in known:
+                subnets[prefix] = subnet_id
+            elif known[network] != subnet_id:
+                logger.warning('KEA_SUBNETS has id %s for %s, Kea has %s',
+                               subnet_id, prefix, known[network])
+        subnets.update(fetched)
+        if not subnets:
+            logger.error('No Kea subnets known: dhcp4_subnet is empty and '
+                         'KEA_SUBNETS is not set, DHCP reservations will fail')
+        self._build(subnets)
+        self._loaded_at = time.monotonic()
+
+    @property
+    def empty(self) -> bool:
+        return not self._ids
+
+    async def get_subnet_id(self, ip_address: str) -> int:
+        async with self._lock:
+            if self._loaded_at is None or \
+                    time.monotonic() - self._loaded_at > self.ttl:
+                await self.refresh()
+        address = int(ipaddress.IPv4Address(ip_address))
+        index = bisect.bisect_right(self._starts, address) - 1
+        if index >= 0 and address <= self._ends[index]:
+            return self._ids[index]
+        raise ValueError(f'No suitable subnet for IP {ip_address}')
+
+
+_resolver: SubnetIdResolver | None = None
+
+
+def create_subnet_resolver(kea_sessionmaker: sessionmaker,
+                           static_subnets: dict[str, int] = None,
+                           ttl: float = 300) -> SubnetIdResolver:
+    global _resolver
+    _resolver = SubnetIdResolver(kea_sessionmaker,
+                                 static_subnets=static_subnets, ttl=ttl)
+    return _resolver
+
+
+def get_subnet_resolver() -> SubnetIdResolver:
+    return _resolver
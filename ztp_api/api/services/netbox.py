@@ -0,0 +1,145 @@
+import asyncio
+import bisect
+import ipaddress
+import time
+
+import aiohttp
+
+
+class PrefixResolver:
+    """
+    Cached NetBox IPv4 prefixes, their VLANs and gw-tagged addresses.
+    Longest-prefix match is one dict lookup per known prefix length.
+    """
+    page_size = 1000
+
+    def __init__(self, session: aiohttp.ClientSession, ttl: float = 300,
+                 miss_refresh_interval: float = 10):
+        self.session = session
+        self.ttl = ttl
+        self.miss_refresh_interval = miss_refresh_interval
+        self._by_length: dict[int, dict[int, dict]] = {}
+        self._lengths: list[int] = []
+        self._by_prefix: dict[str, dict] = {}
+        self._by_vlan: dict[int, list[dict]] = {}
+        self._gateways: list[tuple[int, str]] = []
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    async def _fetch_all(self, path: str, params: dict = None) -> list[dict]:
+        params = dict(params or {})
+        params['limit'] = self.page_size
+        results = []
+        offset = 0
+        while True:
+            params['offset'] = offset
+            async with self.session.get(path, params=params) as response:
+                answer = await response.json()
+            page = answer['results']
+            results.extend(page)
+            offset += len(page)
+            if not page or offset >= answer['count']:
+                break
+        return results
+
+    async def _load(self):
+        prefixes, gateways = await asyncio.gather(
+            self._fetch_all('/api/ipam/prefixes/', {'family': 4}),
+            self._fetch_all('/api/ipam/ip-addresses/',
+                            {'family': 4, 'tag': 'gw'}),
+        )
+        by_length = {}
+        by_prefix = {}
+        by_vlan = {}
+        for prefix in prefixes:
+            network = ipaddress.IPv4Network(prefix['prefix'])
+            by_length.setdefault(network.prefixlen, {}).setdefault(
+                int(network.network_address), prefix)
+            by_prefix.setdefault(network.with_prefixlen, prefix)
+            if prefix.get('vlan'):
+                by_vlan.setdefault(prefix['vlan']['id'], []).append(prefix)
+        self._by_length = by_length
+        self._lengths = sorted(by_length, reverse=True)
+        self._by_prefix = by_prefix
+        self._by_vlan = by_vlan
+        self._gateways = sorted(
+            (int(ipaddress.IPv4Interface(address['address']).ip),
+             address['address'])
+            for address in gateways
+        )
+        self._loaded_at = time.monotonic()
+
+    async def _ensure_loaded(self, on_miss: bool = False):
+        async with self._lock:
+            now = time.monotonic()
+            if self._loaded_at is None or now - self._loaded_at > self.ttl:
+                await self._load()
+            elif on_miss and now - self._loaded_at > self.miss_refresh_interval:
+                await self._load()
+
+    def _lookup(self, ip_address: str) -> dict | None:
+        address = int(ipaddress.IPv4Address(ip_address))
+        for length in self._lengths:
+            mask = (0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF
+            prefix = self._by_length[length].get(address & mask)
+            if prefix:
+                return prefix
+        return None
+
+    async def get_prefix(self, ip_address: str) -> dict | None:
+        """Most specific NetBox prefix containing ``ip_address``"""
+        await self._ensure_loaded()
+        prefix = self._lookup(ip_address)
+        if prefix is None:
+            await self._ensure_loaded(on_miss=True)
+            prefix = self._lookup(ip_address)
+        return prefix
+
+    async def get_exact_prefix(self, prefix: str) -> dict | None:
+        prefix = ipaddress.IPv4Network(prefix, strict=False).with_prefixlen
+        await self._ensure_loaded()
+        if prefix not in self._by_prefix:
+            await self._ensure_loaded(on_miss=True)
+        return self._by_prefix.get(prefix)
+
+    async def get_vlan_prefixes(self, vlan_id: int) -> list[dict]:
+        """Prefixes bound to the NetBox VLAN object ``vlan_id``"""
+        await self._ensure_loaded()
+        if vlan_id not in self._by_vlan:
+            await self._ensure_loaded(on_miss=True)
+        return list(self._by_vlan.get(vlan_id, []))
+
+    def _find_gateway(self, network: ipaddress.IPv4Network) -> str | None:
+        start = int(network.network_address)
+        end = int(network.broadcast_address)
+        index = bisect.bisect_left(self._gateways, (start, ''))
+        if index < len(self._gateways) and self._gateways[index][0] <= end:
+            return self._gateways[index][1]
+        return None
+
+    async def get_gateway(self, prefix: str) -> str | None:
+        """First gw-tagged address (with mask) inside ``prefix``"""
+        network = ipaddress.IPv4Network(prefix, strict=False)
+        await self._ensure_loaded()
+        gateway = self._find_gateway(network)
+        if gateway is None:
+            await self._ensure_loaded(on_miss=True)
+            gateway = self._find_gateway(network)
+        return gateway
+
+
+_resolver: PrefixResolver | None = None
+
+
+def create_prefix_resolver(session: aiohttp.ClientSession,
+                           ttl: float = 300) -> PrefixResolver:
+    global _resolver
+    _resolver = PrefixResolver(session, ttl=ttl)
+    return _resolver
+
+
+def get_prefix_resolver() -> PrefixResolver:
+    return _resolver
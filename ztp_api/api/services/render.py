@@ -0,0 +1,71 @@
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from jinja2 import Template
+
+
+@functools.lru_cache(maxsize=64)
+def _compile(source: str, options: tuple) -> Template:
+    return Template(source, **dict(options))
+
+
+def _render(source: str, options: tuple, variables: dict) -> str:
+    # runs in a pool process, compiled templates are cached per process
+    return _compile(source, options).render(**variables)
+
+
+class ConfigRenderer:
+    """
+    Renders Jinja templates in a process pool so that large configs do
+    not block the event loop. Templates travel as source text. Workers
+    come from a forkserver, never forked from the threaded API process.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers
+        self._executor = self._create_executor()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('forkserver'))
+
+    async def render(self, source: str, variables: dict, **options) -> str:
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            return await loop.run_in_executor(
+                executor, _render, source, tuple(sorted(options.items())),
+                variables)
+        except BrokenProcessPool:
+            # a worker died, the next call gets a fresh pool
+            if self._executor is executor:
+                self._executor = self._create_executor()
+            raise
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._executor.shutdown, wait=True,
+                                cancel_futures=True)
+
+
+_renderer: ConfigRenderer | None = None
+
+
+def create_config_renderer(max_workers: int = None) -> ConfigRenderer:
+    global _renderer
+    _renderer = ConfigRenderer(max_workers=max_workers)
+    return _renderer
+
+
+def get_config_renderer() -> ConfigRenderer:
+    return _renderer
+
+
+async def close_config_renderer() -> None:
+    global _renderer
+    if _renderer is not None:
+        await _renderer.close()
+        _renderer = None
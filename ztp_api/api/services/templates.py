@@ -0,0 +1,81 @@
+import time
+from collections import OrderedDict
+
+from jinja2 import Template
+
+from ztp_api.api.services.tftp import AsyncTftpWrapper
+
+
+class CachedTemplate:
+    __slots__ = ('source', 'modify_time', 'checked_at', 'compiled')
+
+    def __init__(self, source: str, modify_time):
+        self.source = source
+        self.modify_time = modify_time
+        self.checked_at = time.monotonic()
+        self.compiled: dict[tuple, Template] = {}
+
+
+class TemplateRepository:
+    """
+    LRU cache of configuration templates stored on the TFTP server.
+    A cached file is revalidated with MDTM at most once per ``ttl``
+    seconds and only downloaded again when its modify time changes.
+    """
+
+    def __init__(self, tftp: AsyncTftpWrapper, maxsize: int = 64,
+                 ttl: float = 60):
+        self.tftp = tftp
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cache: OrderedDict[tuple[str, str], CachedTemplate] = \
+            OrderedDict()
+
+    def invalidate(self, filename: str = None, folder: str = None):
+        if filename is None:
+            self._cache.clear()
+        else:
+            self._cache.pop((folder, filename), None)
+
+    async def _load(self, filename: str, folder: str) -> CachedTemplate:
+        key = (folder, filename)
+        cached = self._cache.get(key)
+        if cached and time.monotonic() - cached.checked_at < self.ttl:
+            self._cache.move_to_end(key)
+            return cached
+        modify_time = await self.tftp.get_modify_time(filename, folder)
+        if cached and cached.modify_time == modify_time:
+            cached.checked_at = time.monotonic()
+            self._cache.move_to_end(key)
+            return cached
+        source = await self.tftp.download(filename, folder)
+        cached = CachedTemplate(source, modify_time)
+        self._cache[key] = cached
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return cached
+
+    async def get_source(self, filename: str, folder: str) -> str:
+        return (await self._load(filename, folder)).source
+
+    async def get(self, filename: str, folder: str, **options) -> Template:
+        cached = await self._load(filename, folder)
+        options_key = tuple(sorted(options.items()))
+        if options_key not in cached.compiled:
+            cached.compiled[options_key] = Template(cached.source, **options)
+        return cached.compiled[options_key]
+
+
+_repository: TemplateRepository | None = None
+
+
+def create_template_repository(tftp: AsyncTftpWrapper, maxsize: int = 64,
+                               ttl: float = 60) -> TemplateRepository:
+    global _repository
+    _repository = TemplateRepository(tftp, maxsize=maxsize, ttl=ttl)
+    return _repository
+
+
+def get_template_repository() -> TemplateRepository:
+    return _repository
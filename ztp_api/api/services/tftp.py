@@ -1,6 +1,8 @@
+import asyncio
 import datetime
+import time
 from typing import Any
-from ftplib import FTP
+from ftplib import FTP, error_perm, error_temp
 import io
 
 
@@ -9,7 +11,9 @@ class TftpWrapper:
         self.host = host
         self.username = username
         self.password = password
-        self.ftp = FTP(self.host, self.username, self.password)
+        self.ftp = FTP()
+        self.home = None
+        self.folder = None
 
     def __enter__(self):
         self.start()
@@ -19,24 +23,34 @@ class TftpWrapper:
         self.finish()
 
     def start(self):
-        self.ftp.connect()
+        self.ftp.connect(self.host)
         self.ftp.login(self.username, self.password)
+        self.home = self.ftp.pwd()
+        self.folder = None
 
     def finish(self):
         self.ftp.close()
 
-    def list_files(self, folder=None):
+    def chdir(self, folder=None):
+        if folder == self.folder:
+            return
+        self.ftp.cwd(self.home)
+        self.folder = None
         if folder:
             self.ftp.cwd(folder)
+            self.folder = folder
+
+    def list_files(self, folder=None):
+        self.chdir(folder)
         result = self.ftp.nlst()
         return result
 
     def get_modify_time(self, filename: str, folder=None):
-        if folder:
-            self.ftp.cwd(folder)
-        if filename not in self.ftp.nlst():
-            raise FileNotFoundError
-        response = self.ftp.voidcmd('MDTM {}'.format(filename))
+        self.chdir(folder)
+        try:
+            response = self.ftp.voidcmd('MDTM {}'.format(filename))
+        except error_perm as exc:
+            raise FileNotFoundError(filename) from exc
         datetime_string = response[4:]
         return datetime.datetime.strptime(datetime_string, '%Y%m%d%H%M%S')
 
@@ -44,32 +58,194 @@ class TftpWrapper:
         def store_one_line(line: bytes) -> None:
             decoded = line.decode('utf-8')
             data.append(decoded)
-        if folder:
-            self.ftp.cwd(folder)
-        if filename not in self.ftp.nlst():
-            raise FileNotFoundError
+        self.chdir(folder)
         data = []
-        self.ftp.retrbinary('RETR {}'.format(filename), callback=store_one_line)
+        try:
+            self.ftp.retrbinary('RETR {}'.format(filename),
+                                callback=store_one_line)
+        except error_perm as exc:
+            raise FileNotFoundError(filename) from exc
         file_content = ''.join(data)
         file_content = file_content.replace('\r', '')
         return file_content
 
     def upload(self, filename: str, content: str, folder=None):
-        if folder:
-            self.ftp.cwd(folder)
+        self.chdir(folder)
         file_obj = io.BytesIO(bytearray(content, 'utf-8'))
         self.ftp.storlines('STOR {}'.format(filename), file_obj)
 
     def upload_binary(self, filename: str, content: Any, folder=None):
-        if folder:
-            self.ftp.cwd(folder)
+        self.chdir(folder)
         file_obj = io.BytesIO(content)
         file_obj.flush()
         self.ftp.storbinary('STOR {}'.format(filename), file_obj)
 
     def delete(self, filename: str, folder=None):
-        if folder:
-            self.ftp.cwd(folder)
-        if filename not in self.ftp.nlst():
-            raise FileNotFoundError
-        self.ftp.delete(filename)
+        self.chdir(folder)
+        try:
+            self.ftp.delete(filename)
+        except error_perm as exc:
+            raise FileNotFoundError(filename) from exc
+
+
+class AsyncTftpWrapper:
+    """
+    TftpWrapper API as coroutines. Blocking ftplib calls run in worker
+    threads on a small pool of reused connections; directory listings
+    are cached for ``listing_ttl`` seconds.
+    """
+
+    def __init__(self, host: str, username: str, password: str,
+                 pool_size: int = 4, listing_ttl: float = 30):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.pool_size = pool_size
+        self.listing_ttl = listing_ttl
+        self._idle: asyncio.Queue[TftpWrapper] = asyncio.Queue()
+        self._connections: list[TftpWrapper] = []
+        self._listings: dict[str | None, tuple[float, set[str]]] = {}
+
+    def _release(self, connection: TftpWrapper, done: asyncio.Future):
+        if not done.cancelled():
+            done.exception()  # retrieved by the caller unless it gave up
+        if connection in self._connections:
+            self._idle.put_nowait(connection)
+
+    async def _acquire(self) -> TftpWrapper:
+        if self._idle.empty() and len(self._connections) < self.pool_size:
+            connection = TftpWrapper(self.host, self.username, self.password)
+            self._connections.append(connection)
+            starting = asyncio.ensure_future(
+                asyncio.to_thread(connection.start))
+            try:
+                await asyncio.shield(starting)
+            except asyncio.CancelledError:
+                # the login keeps running in its thread, pool it afterwards
+                starting.add_done_callback(
+                    lambda done: self._started(connection, done))
+                raise
+            except Exception:
+                self._connections.remove(connection)
+                raise
+            return connection
+        return await self._idle.get()
+
+    def _started(self, connection: TftpWrapper, done: asyncio.Future):
+        if done.cancelled() or done.exception() is not None:
+            if connection in self._connections:
+                self._connections.remove(connection)
+            return
+        self._release(connection, done)
+
+    @staticmethod
+    def _call_sync(connection: TftpWrapper, method: str, *args):
+        try:
+            return getattr(connection, method)(*args)
+        except FileNotFoundError:
+            raise
+        except (error_temp, EOFError, OSError):
+            # stale control connection, reconnect and retry once
+            try:
+                connection.finish()
+            except Exception:
+                pass
+            connection.start()
+            return getattr(connection, method)(*args)
+
+    async def _call(self, method: str, *args):
+        connection = await self._acquire()
+        call = asyncio.ensure_future(
+            asyncio.to_thread(self._call_sync, connection, method, *args))
+        # a thread cannot be cancelled: the connection is only reused once
+        # it is done with it, even if the caller stops waiting
+        call.add_done_callback(lambda done: self._release(connection, done))
+        return await asyncio.shield(call)
+
+    async def close(self):
+        connections, self._connections = self._connections, []
+        self._idle = asyncio.Queue()
+        for connection in connections:
+            try:
+                await asyncio.to_thread(connection.finish)
+            except Exception:
+                pass
+
+    async def list_files(self, folder=None):
+        cached = self._listings.get(folder)
+        if cached and time.monotonic() - cached[0] < self.listing_ttl:
+            return list(cached[1])
+        result = await self._call('list_files', folder)
+        self._listings[folder] = (time.monotonic(), set(result))
+        return result
+
+    async def _ensure_exists(self, filename: str, folder=None):
+        if filename in await self.list_files(folder):
+            return
+        self._listings.pop(folder, None)
+        if filename not in await self.list_files(folder):
+            raise FileNotFoundError(filename)
+
+    def _forget(self, filename: str, folder=None):
+        cached = self._listings.get(folder)
+        if cached:
+            cached[1].discard(filename)
+
+    def _remember(self, filename: str, folder=None):
+        cached = self._listings.get(folder)
+        if cached:
+            cached[1].add(filename)
+
+    async def get_modify_time(self, filename: str, folder=None):
+        await self._ensure_exists(filename, folder)
+        try:
+            return await self._call('get_modify_time', filename, folder)
+        except FileNotFoundError:
+            self._forget(filename, folder)
+            raise
+
+    async def download(self, filename: str, folder=None):
+        await self._ensure_exists(filename, folder)
+        try:
+            return await self._call('download', filename, folder)
+        except FileNotFoundError:
+            self._forget(filename, folder)
+            raise
+
+    async def upload(self, filename: str, content: str, folder=None):
+        await self._call('upload', filename, content, folder)
+        self._remember(filename, folder)
+
+    async def upload_binary(self, filename: str, content: Any, folder=None):
+        await self._call('upload_binary', filename, content, folder)
+        self._remember(filename, folder)
+
+    async def delete(self, filename: str, folder=None):
+        await self._ensure_exists(filename, folder)
+        try:
+            await self._call('delete', filename, folder)
+        finally:
+            self._forget(filename, folder)
+
+
+_client: AsyncTftpWrapper | None = None
+
+
+def create_tftp_client(host: str, username: str, password: str,
+                       pool_size: int = 4,
+                       listing_ttl: float = 30) -> AsyncTftpWrapper:
+    global _client
+    _client = AsyncTftpWrapper(host, username, password,
+                               pool_size=pool_size, listing_ttl=listing_ttl)
+    return _client
+
+
+def get_tftp_client() -> AsyncTftpWrapper:
+    return _client
+
+
+async def close_tftp_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -0,0 +1,69 @@
+import asyncio
+import copy
+import time
+
+import aiohttp
+from pyuserside.api.asynchronous import UsersideAPI
+
+
+class CachedUsersideAPI(UsersideAPI):
+    """
+    UsersideAPI whose read methods listed in ``ttls`` (``'cat.action'``
+    -> seconds) are cached, and identical calls already in flight share
+    one request. Failures are not cached. Everything else goes straight
+    to Userside.
+    """
+
+    def __init__(self, url: str, key: str, session: aiohttp.ClientSession,
+                 ttls: dict[str, float] = None):
+        super().__init__(url=url, key=key)
+        self._session = session
+        self.ttls = ttls or {}
+        self._cache: dict[tuple, tuple[float, object]] = {}
+        self._inflight: dict[tuple, asyncio.Future] = {}
+
+    def invalidate(self):
+        self._cache.clear()
+
+    async def request(self, cat: str, action: str, **kwargs):
+        ttl = self.ttls.get(f'{cat}.{action}')
+        if not ttl:
+            return await super().request(cat, action, **kwargs)
+        key = (cat, action, tuple(sorted((name, str(value))
+                                         for name, value in kwargs.items())))
+        cached = self._cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return copy.deepcopy(cached[1])
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(
+                super().request(cat, action, **kwargs))
+            self._inflight[key] = future
+            future.add_done_callback(
+                lambda done: self._store(key, ttl, done))
+        # shield: one caller giving up must not cancel the shared request
+        return copy.deepcopy(await asyncio.shield(future))
+
+    def _store(self, key: tuple, ttl: float, future: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            self._cache[key] = (time.monotonic() + ttl, future.result())
+            if len(self._cache) > 4096:
+                now = time.monotonic()
+                self._cache = {cache_key: value
+                               for cache_key, value in self._cache.items()
+                               if value[0] > now}
+
+
+_api: CachedUsersideAPI | None = None
+
+
+def create_userside_api(url: str, key: str, session: aiohttp.ClientSession,
+                        ttls: dict[str, float] = None) -> CachedUsersideAPI:
+    global _api
+    _api = CachedUsersideAPI(url, key, session, ttls=ttls)
+    return _api
+
+
+def get_userside_api() -> CachedUsersideAPI:
+    return _api
@@ -8,6 +8,8 @@ from pydantic import (
     RedisDsn
 )
 
+from ztp_api.common.settings import SettingsProvider
+
 
 def yaml_settings(settings: BaseSettings):
     with open(os.environ.get('ZTPAPI_CONFIG')) as cfg_file:
@@ -30,6 +32,46 @@ class Settings(BaseSettings):
     DEVICEAPI_URL: HttpUrl
     CELERY_BROKER: RedisDsn
     CELERY_BACKEND: RedisDsn
+    # prefork workers need the process killed to stop a job; the worker's
+    # threads pool ignores terminate and cancels revoked jobs itself
+    ZTP_STOP_TERMINATE: bool = True
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    HTTP_LIMIT_PER_HOST: int = 10
+    HTTP_KEEPALIVE_TIMEOUT: float = 30
+    HTTP_DNS_CACHE_TTL: int = 300
+    HTTP_TIMEOUT: float = 60
+    DEVICEAPI_TIMEOUT: float = 300
+    NETBOX_CACHE_TTL: float = 300
+    BULK_CONCURRENCY: int = 8
+    TFTP_POOL_SIZE: int = 4
+    TFTP_LISTING_TTL: float = 30
+    TEMPLATE_CACHE_SIZE: int = 64
+    TEMPLATE_CACHE_TTL: float = 60
+    RENDER_WORKERS: int = None
+    # prefix -> Kea subnet id for subnets missing from dhcp4_subnet; must
+    # be filled in when Kea is configured from its JSON file
+    KEA_SUBNETS: dict[str, int] = {}
+    KEA_SUBNETS_TTL: float = 300
+    MODEL_CATALOG_TTL: float = 300
+    USERSIDE_CACHE_TTLS: dict[str, float] = {
+        'task.show': 60,
+        'inventory.get_inventory_id': 300,
+        'inventory.get_inventory': 300,
+        'device.get_device_id': 300,
+        'device.get_data': 60,
+        'commutation.get_data': 60,
+    }
+    IPAM_LEDGER_URL: str = None
+    IPAM_HOLD: int = 3600
+    IPAM_RESERVE_IN_NETBOX: bool = False
+    IPAM_WARM_POOL_SIZE: int = 0
+    IPAM_WARM_POOL_TTL: float = 30
+    IPAM_FETCH_LIMIT: int = 32
+    SETTINGS_RELOAD: bool = False
+    SETTINGS_RELOAD_INTERVAL: float = 5
 
     class Config:
         env_prefix = 'ZTPAPI_'
@@ -49,3 +91,6 @@ class Settings(BaseSettings):
                 env_settings,
                 file_secret_settings,
             )
+
+
+settings_provider = SettingsProvider(Settings, 'ZTPAPI_CONFIG')
@@ -0,0 +1,58 @@
+import functools
+import ipaddress
+import struct
+
+
+DLINK_ENTERPRISE_ID = 0xAB
+DLINK_FIRMWARE_SUBOPTION = 1
+
+
+def encode_ipv4(address: str) -> bytes:
+    return struct.pack('!I', int(ipaddress.IPv4Interface(address).ip))
+
+
+def encode_string(value: str) -> bytes:
+    return value.encode('utf-8')
+
+
+def encode_netmask(prefix: str) -> bytes:
+    # stored as the decimal integer string, as it always has been
+    return encode_string(str(int(ipaddress.IPv4Interface(prefix).netmask)))
+
+
+def encode_mac(mac: str) -> bytes:
+    return bytes.fromhex(mac)
+
+
+def encode_dlink_firmware(firmware_filename: str) -> bytes:
+    """Option 125 with the D-Link vendor id and firmware file suboption"""
+    filename = encode_string(firmware_filename)
+    return struct.pack('!IBBB',
+                       DLINK_ENTERPRISE_ID,
+                       len(filename) + 2,
+                       DLINK_FIRMWARE_SUBOPTION,
+                       len(filename)) + filename
+
+
+@functools.lru_cache(maxsize=256)
+def model_options(firmware_filename: str,
+                  tftp_server: str) -> tuple[tuple[int, bytes], ...]:
+    """Options shared by every switch of one firmware and TFTP server"""
+    # firmware = settings.TFTP_FOLDER_STRUCTURE['firmwares'] + firmware_filename
+    firmware = 'firmwares/' + firmware_filename
+    return (
+        (66, encode_string(tftp_server)),
+        (150, encode_ipv4(tftp_server)),
+        (125, encode_dlink_firmware(firmware)),
+    )
+
+
+def host_options(prefix: str, gateway: str,
+                 ip_address: str) -> tuple[tuple[int, bytes], ...]:
+    # filename = settings.TFTP_FOLDER_STRUCTURE['configs_initial'] + ip_address + '.cfg'
+    config_filename = 'configs/initial/' + ip_address + '.cfg'
+    return (
+        (1, encode_netmask(prefix)),
+        (3, encode_ipv4(gateway)),
+        (67, encode_string(config_filename)),
+    )
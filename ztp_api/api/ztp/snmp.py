@@ -0,0 +1,28 @@
+import asyncio
+
+from ztp_api.common.vlans import DOT1Q_VLAN_STATIC_EGRESS_PORTS, \
+    DOT1Q_VLAN_STATIC_UNTAGGED_PORTS
+
+
+IF_ALIAS = '1.3.6.1.2.1.31.1.1.1.18'
+DOT1Q_VLAN_STATIC_NAME = '1.3.6.1.2.1.17.7.1.4.3.1.1'
+
+
+async def walk(da, ip: str, oid: str) -> list[dict]:
+    async with da.get('/snmp/v2/walk',
+                      params={'ip': ip, 'oid': oid}) as response:
+        answer = await response.json()
+    return answer['response']
+
+
+async def collect_switch_settings(da, ip: str):
+    """
+    Port descriptions, VLAN names, egress and untagged port lists,
+    walked in parallel
+    """
+    return await asyncio.gather(
+        walk(da, ip, IF_ALIAS),
+        walk(da, ip, DOT1Q_VLAN_STATIC_NAME),
+        walk(da, ip, DOT1Q_VLAN_STATIC_EGRESS_PORTS),
+        walk(da, ip, DOT1Q_VLAN_STATIC_UNTAGGED_PORTS),
+    )
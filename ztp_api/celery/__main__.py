@@ -2,7 +2,7 @@ from configargparse import ArgumentParser, ArgumentDefaultsHelpFormatter
 import celery
 from pathlib import Path
 import os
-from ztp_api.celery.settings import Settings
+from ztp_api.celery.settings import settings_provider
 
 
 ENV_VAR_PREFIX = 'ZTPAPIRQ_'
@@ -16,6 +16,8 @@ parser = ArgumentParser(
 group = parser.add_argument_group('Configuration')
 group.add_argument('--broker', '-b', default='amqp://localhost', help='Broker URL')
 group.add_argument('--result', '-r', default='rpc://localhost', help='Result backend')
+group.add_argument('--pool', '-P', default='prefork', choices=['prefork', 'threads', 'solo'], help='Worker pool. prefork runs one ZTP job per process; threads runs up to --concurrency jobs on one shared event loop and cancels stopped jobs itself (terminate requests are ignored)')
+group.add_argument('--concurrency', type=int, default=None, help='Worker pool size (Celery default when unset, e.g. 200 for threads)')
 
 group = parser.add_argument_group('Config file')
 group.add_argument('--config', '-c', default=str(Path(__file__).resolve().parent.parent.parent / 'settings.yml'), help='config file path')
@@ -26,8 +28,26 @@ def main():
 
     os.environ['ZTPAPIRQ_CONFIG'] = args.config
 
-    s = Settings()
+    settings = settings_provider.get()
+    if not settings.VLAN_CACHE_URL:
+        # jobs in different processes must share VLAN tables and locks
+        if args.broker.startswith(('redis://', 'rediss://')):
+            os.environ[f'{ENV_VAR_PREFIX}VLAN_CACHE_URL'] = args.broker
+            settings_provider.reload()
+        elif args.pool == 'prefork':
+            parser.error('VLAN_CACHE_URL must point to Redis with '
+                         '--pool=prefork (or use a redis:// broker), '
+                         'otherwise jobs on the same parent switch in '
+                         'different processes overwrite each other')
 
     app = celery.Celery(include=['ztp_api.celery.tasks'], broker=args.broker, backend=args.result)
 
-    app.worker_main(argv=['worker', '--loglevel=debug',  '-E', '-n api_worker'])
+    argv = ['worker', '--loglevel=debug',  '-E', '-n api_worker']
+    if args.pool == 'threads':
+        # the CLI only takes pool aliases; without --pool celery uses this
+        app.conf.worker_pool = 'ztp_api.celery.pool:TaskPool'
+    else:
+        argv.append(f'--pool={args.pool}')
+    if args.concurrency:
+        argv.append(f'--concurrency={args.concurrency}')
+    app.worker_main(argv=argv)
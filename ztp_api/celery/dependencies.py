@@ -1,25 +1,74 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
 import aiohttp
 import aioftp
 from aiogram import Bot
-from ztp_api.celery.settings import Settings
-from functools import lru_cache
+from ztp_api.api.db.session import create_engine_pool, dispose_engines
+from ztp_api.celery.settings import Settings, settings_provider
+
+
+logger = logging.getLogger(__name__)
+
+_loop_clients: dict[asyncio.AbstractEventLoop,
+                    dict[str, tuple[Any, Callable[[Any], Awaitable]]]] = {}
+
+
+def get_settings() -> Settings:
+    return settings_provider.get()
+
+
+def loop_client(name: str, factory: Callable[[], Any],
+                closer: Callable[[Any], Awaitable] = None):
+    """One ``factory()`` instance per running event loop, shared by jobs"""
+    loop = asyncio.get_running_loop()
+    for other_loop in [other for other in _loop_clients if other.is_closed()]:
+        del _loop_clients[other_loop]
+    clients = _loop_clients.setdefault(loop, {})
+    if name not in clients:
+        clients[name] = (factory(), closer)
+    return clients[name][0]
 
 
-@lru_cache
-def get_settings():
-    return Settings()
+async def close_loop_clients() -> None:
+    clients = _loop_clients.pop(asyncio.get_running_loop(), {})
+    # clients built on top of other clients are registered after them
+    for name, (client, closer) in reversed(clients.items()):
+        if closer is None:
+            continue
+        try:
+            await closer(client)
+        except Exception:
+            logger.exception('Failed to close %s', name)
 
 
 def get_deviceapi_session():
     settings = get_settings()
-    session = aiohttp.ClientSession(settings.DEVICEAPI_URL)
-    return session
+    return loop_client(
+        'deviceapi',
+        lambda: aiohttp.ClientSession(settings.DEVICEAPI_URL),
+        lambda session: session.close(),
+    )
 
 
 def get_self_session():
     settings = get_settings()
-    session = aiohttp.ClientSession(settings.SELF_URL)
-    return session
+    return loop_client(
+        'self',
+        lambda: aiohttp.ClientSession(settings.SELF_URL),
+        lambda session: session.close(),
+    )
+
+
+def get_project_db():
+    settings = get_settings()
+    return loop_client(
+        'project_db',
+        lambda: create_engine_pool(settings.PROJECT_DB),
+        lambda _: dispose_engines(),
+    )
+
 
 async def get_ftp_session():
     settings = get_settings()
@@ -31,7 +80,8 @@ async def get_ftp_session():
 
 def get_telegram_bot():
     settings = get_settings()
-    bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
-    return bot
-
-
+    return loop_client(
+        'telegram',
+        lambda: Bot(token=settings.TELEGRAM_BOT_TOKEN),
+        lambda bot: bot.session.close(),
+    )
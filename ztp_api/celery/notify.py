@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import time
+
+from ztp_api.celery.dependencies import get_settings, get_telegram_bot, \
+    loop_client
+
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MAX_LENGTH = 4096
+DASHBOARD = 'dashboard'
+
+
+def retry_after(exc: Exception) -> float | None:
+    """Flood-control delay of an aiogram error, if it is one"""
+    for attribute in ('retry_after', 'timeout'):
+        value = getattr(exc, attribute, None)
+        if isinstance(value, (int, float)):
+            return value
+    return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        self._refill()
+        while self.tokens < 1:
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+            self._refill()
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class ChatChannel:
+    """
+    Messages of one chat, keyed by job. Only the newest text of a key is
+    kept while it waits for the rate limit, so superseded edits are never
+    sent.
+    """
+
+    def __init__(self, bot, chat_id: int, bucket: TokenBucket):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.bucket = bucket
+        self.pending: dict[str, tuple[str, bool]] = {}
+        self.message_ids: dict[str, int] = {}
+        self.sent: dict[str, str] = {}
+        self._busy = False
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def post(self, key: str, text: str, final: bool = False) -> None:
+        self.pending[key] = (text[:TELEGRAM_MAX_LENGTH], final)
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def forget(self, key: str) -> None:
+        self.message_ids.pop(key, None)
+        self.sent.pop(key, None)
+
+    async def _deliver(self, key: str, text: str) -> None:
+        message_id = self.message_ids.get(key)
+        if message_id is None:
+            message = await self.bot.send_message(chat_id=self.chat_id,
+                                                  text=text)
+            self.message_ids[key] = message.message_id
+        else:
+            await self.bot.edit_message_text(text=text, chat_id=self.chat_id,
+                                             message_id=message_id)
+        self.sent[key] = text
+
+    async def _send_next(self) -> None:
+        key = next(iter(self.pending))
+        text, final = self.pending[key]
+        if self.sent.get(key) != text:
+            await self.bucket.acquire()
+            # the job may have moved on while we waited for a token
+            text, final = self.pending[key]
+        del self.pending[key]
+        if self.sent.get(key) != text:
+            try:
+                await self._deliver(key, text)
+            except Exception as exc:
+                delay = retry_after(exc)
+                if delay is None:
+                    logger.exception('Failed to notify chat %s', self.chat_id)
+                    self.forget(key)
+                    return
+                self.bucket.pause(delay)
+                self.pending.setdefault(key, (text, final))
+                return
+        if final:
+            self.forget(key)
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            self._busy = True
+            try:
+                while self.pending:
+                    await self._send_next()
+            finally:
+                self._busy = False
+
+    async def drain(self) -> None:
+        while self.pending or self._busy:
+            await asyncio.sleep(0.1)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class ProgressNotifier:
+    """
+    Fire-and-forget ZTP progress for every configured chat. ``update``
+    never waits on Telegram; each chat has its own sender and token bucket.
+    In dashboard mode each chat gets one rolling message listing all
+    current jobs instead of a message per job.
+    """
+
+    def __init__(self, bot, chat_ids: list[int], rate: float = 0.3,
+                 burst: int = 3, dashboard: bool = False,
+                 dashboard_keep: float = 600):
+        self.dashboard = dashboard
+        self.dashboard_keep = dashboard_keep
+        self.channels = [ChatChannel(bot, chat_id, TokenBucket(rate, burst))
+                         for chat_id in chat_ids]
+        self.jobs: dict[str, tuple[str, float | None]] = {}
+
+    def _render_dashboard(self) -> str:
+        now = time.monotonic()
+        for key, (_, finished_at) in list(self.jobs.items()):
+            if finished_at is not None and \
+                    now - finished_at > self.dashboard_keep:
+                del self.jobs[key]
+        return '\n'.join(text for text, _ in self.jobs.values())
+
+    def update(self, key: str, text: str, final: bool = False) -> None:
+        if not self.dashboard:
+            for channel in self.channels:
+                channel.post(key, text, final)
+            return
+        if all(finished_at is not None
+               for _, finished_at in self.jobs.values()):
+            # nothing running: start a fresh dashboard message
+            for channel in self.channels:
+                channel.forget(DASHBOARD)
+        self.jobs[key] = (text, time.monotonic() if final else None)
+        dashboard = self._render_dashboard()
+        for channel in self.channels:
+            channel.post(DASHBOARD, dashboard)
+
+    async def close(self, timeout: float = 30) -> None:
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*[channel.drain()
+                                 for channel in self.channels]),
+                timeout)
+        except asyncio.TimeoutError:
+            logger.warning('Dropping undelivered notifications')
+        for channel in self.channels:
+            await channel.stop()
+
+
+def get_notifier() -> ProgressNotifier:
+    settings = get_settings()
+    return loop_client(
+        'notifier',
+        lambda: ProgressNotifier(
+            get_telegram_bot(),
+            settings.TELEGRAM_CHAT_IDS,
+            rate=settings.TELEGRAM_CHAT_RATE,
+            burst=settings.TELEGRAM_CHAT_BURST,
+            dashboard=settings.TELEGRAM_DASHBOARD,
+            dashboard_keep=settings.TELEGRAM_DASHBOARD_KEEP,
+        ),
+        lambda notifier: notifier.close(),
+    )
@@ -0,0 +1,12 @@
+from celery.concurrency.thread import TaskPool as ThreadTaskPool
+
+
+class TaskPool(ThreadTaskPool):
+    """
+    Threads pool for the shared event loop. Revoked jobs are cancelled by
+    the runner, so a revoke with terminate=True needs nothing from the
+    pool; the stock threads pool raises NotImplementedError for it.
+    """
+
+    def terminate_job(self, pid, signal=None):
+        pass
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+
+from ztp_api.celery.dependencies import get_deviceapi_session, \
+    get_settings, loop_client
+
+
+logger = logging.getLogger(__name__)
+
+
+class WatchedHost:
+    __slots__ = ('available', 'interval', 'next_check', 'waiters')
+
+    def __init__(self, interval: float):
+        self.available: bool | None = None
+        self.interval = interval
+        self.next_check = time.monotonic()
+        self.waiters = 0
+
+
+class ReachabilityWatcher:
+    """
+    Single prober for every IP some job is waiting on. Due hosts are
+    pinged in concurrent batches; a host whose state did not change is
+    checked less and less often (up to ``max_interval``), and a state
+    change wakes the waiting jobs and resets its interval.
+    """
+
+    def __init__(self, min_interval: float = 1, max_interval: float = 10,
+                 batch_size: int = 50):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.batch_size = batch_size
+        self.hosts: dict[str, WatchedHost] = {}
+        self._condition = asyncio.Condition()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._session = None
+
+    async def _probe(self, ip: str) -> bool | None:
+        try:
+            async with self._session.get('/ping/check',
+                                         params={'ip': ip}) as response:
+                result = await response.json()
+            return result['response']['available']
+        except Exception:
+            logger.exception('Failed to ping %s', ip)
+            return None
+
+    async def _check(self, ips: list[str]) -> bool:
+        results = await asyncio.gather(*[self._probe(ip) for ip in ips])
+        changed = False
+        now = time.monotonic()
+        for ip, available in zip(ips, results):
+            host = self.hosts.get(ip)
+            if host is None:
+                continue
+            if available is not None and available != host.available:
+                host.available = available
+                host.interval = self.min_interval
+                changed = True
+            else:
+                host.interval = min(host.interval * 2, self.max_interval)
+            host.next_check = now + host.interval
+        return changed
+
+    async def _run(self) -> None:
+        self._session = get_deviceapi_session()
+        while self.hosts:
+            now = time.monotonic()
+            due = [ip for ip, host in self.hosts.items()
+                   if host.next_check <= now]
+            changed = False
+            for start in range(0, len(due), self.batch_size):
+                changed |= await self._check(
+                    due[start:start + self.batch_size])
+            if changed:
+                async with self._condition:
+                    self._condition.notify_all()
+            if not self.hosts:
+                break
+            delay = min(host.next_check for host in self.hosts.values()) \
+                - time.monotonic()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(delay, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _register(self, ip: str) -> WatchedHost:
+        host = self.hosts.get(ip)
+        if host is None:
+            host = self.hosts[ip] = WatchedHost(self.min_interval)
+        host.waiters += 1
+        host.interval = self.min_interval
+        host.next_check = time.monotonic()
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return host
+
+    def _unregister(self, ip: str) -> None:
+        host = self.hosts.get(ip)
+        if host is None:
+            return
+        host.waiters -= 1
+        if host.waiters <= 0:
+            del self.hosts[ip]
+
+    async def wait_for(self, ip: str, available: bool = True) -> None:
+        host = self._register(ip)
+        try:
+            async with self._condition:
+                await self._condition.wait_for(
+                    lambda: host.available == available
+                )
+        finally:
+            self._unregister(ip)
+
+
+def get_reachability_watcher() -> ReachabilityWatcher:
+    settings = get_settings()
+    return loop_client(
+        'reachability',
+        lambda: ReachabilityWatcher(
+            min_interval=settings.PING_MIN_INTERVAL,
+            max_interval=settings.PING_MAX_INTERVAL,
+            batch_size=settings.PING_BATCH_SIZE,
+        ),
+        lambda watcher: watcher.stop(),
+    )
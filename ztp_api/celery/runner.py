@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Coroutine
+
+from celery.signals import worker_process_shutdown, worker_shutdown
+from celery.worker import state as worker_state
+
+from ztp_api.celery.dependencies import close_loop_clients, get_settings
+from ztp_api.celery.settings import settings_provider
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRunner:
+    """
+    Persistent event loop in a daemon thread. Task threads hand their
+    coroutines over and block on the result, so one worker process can
+    keep hundreds of mostly sleeping jobs on a single loop and share its
+    clients. Jobs whose Celery task id gets revoked are cancelled.
+    """
+
+    def __init__(self, max_jobs: int = 200,
+                 revoke_check_interval: float = 1):
+        self.max_jobs = max_jobs
+        self.revoke_check_interval = revoke_check_interval
+        self.jobs: dict[str, asyncio.Task] = {}
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._serve,
+                                        name='ztp-loop', daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._setup(), self.loop).result()
+
+    def _serve(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _setup(self) -> None:
+        self._semaphore = asyncio.Semaphore(self.max_jobs)
+        self._watchdog = asyncio.create_task(self._watch_revoked())
+
+    async def _watch_revoked(self) -> None:
+        while True:
+            await asyncio.sleep(self.revoke_check_interval)
+            for task_id, job in list(self.jobs.items()):
+                if task_id in worker_state.revoked and not job.done():
+                    logger.info('Cancelling revoked job %s', task_id)
+                    job.cancel()
+
+    async def _job(self, coroutine: Coroutine, task_id: str | None):
+        if task_id is not None:
+            self.jobs[task_id] = asyncio.current_task()
+        try:
+            async with self._semaphore:
+                return await coroutine
+        finally:
+            coroutine.close()
+            if task_id is not None:
+                self.jobs.pop(task_id, None)
+
+    def run(self, coroutine: Coroutine, task_id: str = None):
+        """Run ``coroutine`` on the shared loop and wait for its result.
+        Raises concurrent.futures.CancelledError if the job was revoked."""
+        future = asyncio.run_coroutine_threadsafe(
+            self._job(coroutine, task_id), self.loop)
+        return future.result()
+
+    async def _shutdown(self) -> None:
+        self._watchdog.cancel()
+        jobs = list(self.jobs.values())
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+        await close_loop_clients()
+
+    def stop(self, timeout: float = 30) -> None:
+        try:
+            asyncio.run_coroutine_threadsafe(
+                self._shutdown(), self.loop).result(timeout)
+        except Exception:
+            logger.exception('Failed to stop event loop cleanly')
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        if not self.loop.is_running():
+            self.loop.close()
+
+
+_runner: AsyncRunner | None = None
+_runner_pid: int | None = None
+_runner_lock = threading.Lock()
+
+
+def get_runner() -> AsyncRunner:
+    global _runner, _runner_pid
+    with _runner_lock:
+        # a forked pool child must not reuse the parent's loop thread
+        if _runner is None or _runner_pid != os.getpid():
+            settings = get_settings()
+            if settings.SETTINGS_RELOAD:
+                settings_provider.watch(settings.SETTINGS_RELOAD_INTERVAL)
+            _runner = AsyncRunner(
+                max_jobs=settings.ZTP_MAX_JOBS,
+                revoke_check_interval=settings.ZTP_REVOKE_CHECK_INTERVAL,
+            )
+            _runner_pid = os.getpid()
+        return _runner
+
+
+@worker_shutdown.connect
+@worker_process_shutdown.connect
+def stop_runner(**kwargs) -> None:
+    global _runner
+    with _runner_lock:
+        if _runner is not None and _runner_pid == os.getpid():
+            _runner.stop()
+        _runner = None
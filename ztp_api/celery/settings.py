@@ -6,6 +6,8 @@ from pydantic import (
     IPvAnyAddress
 )
 
+from ztp_api.common.settings import SettingsProvider
+
 
 def yaml_settings(settings: BaseSettings):
     with open(os.environ.get('ZTPAPIRQ_CONFIG')) as cfg_file:
@@ -21,6 +23,26 @@ class Settings(BaseSettings):
     TELEGRAM_BOT_TOKEN: str
     TELEGRAM_CHAT_IDS: list[int]
     SELF_URL: str
+    PROJECT_DB: str = None
+    TFTP_LOG_PATH: str = '/tftp/tftp.log'
+    TFTP_LOG_POLL_INTERVAL: float = 1
+    TFTP_WAIT_TIMEOUT: float = 1800
+    PING_MIN_INTERVAL: float = 1
+    PING_MAX_INTERVAL: float = 10
+    PING_BATCH_SIZE: int = 50
+    ZTP_MAX_JOBS: int = 200
+    ZTP_REVOKE_CHECK_INTERVAL: float = 1
+    # Redis for VLAN tables and per-switch locks; defaults to a redis://
+    # broker, in-process only with a single-process pool
+    VLAN_CACHE_URL: str = None
+    VLAN_CACHE_TTL: int = 30
+    VLAN_CACHE_LOCK_TIMEOUT: int = 120
+    TELEGRAM_CHAT_RATE: float = 0.3
+    TELEGRAM_CHAT_BURST: int = 3
+    TELEGRAM_DASHBOARD: bool = False
+    TELEGRAM_DASHBOARD_KEEP: int = 600
+    SETTINGS_RELOAD: bool = False
+    SETTINGS_RELOAD_INTERVAL: float = 5
 
     class Config:
         env_prefix = 'ZTPAPIRQ_'
@@ -40,3 +62,6 @@ class Settings(BaseSettings):
                 env_settings,
                 file_secret_settings,
             )
+
+
+settings_provider = SettingsProvider(Settings, 'ZTPAPIRQ_CONFIG')
@@ -1,24 +1,20 @@
 import datetime
 
-from celery import current_app
-from aiogram import Bot
-import re
+from celery import current_app, states
+from celery.exceptions import Ignore
 import asyncio
-from typing import Literal
+import concurrent.futures
+from ztp_api.api import crud
+from ztp_api.api.models.entries import ZTPStatus
 from ztp_api.celery.dependencies import get_deviceapi_session, \
-    get_ftp_session, get_telegram_bot, get_settings, get_self_session
-
-
-def hex_to_portlist(hexstring: str) -> list[int]:
-    return [index
-            for index, value
-            in enumerate(''.join([bin(int(char, 16))[2:].zfill(4) for char in hexstring]), 1)
-            if value == '1']
-
-
-def portlist_to_hex(portlist: list[int], hexlen: int) -> str:
-    resultlist = ['1' if i in portlist else '0' for i in range(1, hexlen * 4 + 1)]
-    return hex(int(''.join(resultlist), 2))[2:].zfill(hexlen)
+    get_ftp_session, get_project_db, get_self_session, get_settings
+from ztp_api.celery.notify import get_notifier
+from ztp_api.celery.reachability import get_reachability_watcher
+from ztp_api.celery.runner import get_runner
+from ztp_api.celery.tftplog import get_tftp_log_tailer
+from ztp_api.celery.vlancache import get_vlan_cache
+from ztp_api.common.vlans import DOT1Q_VLAN_STATIC_EGRESS_PORTS, \
+    DOT1Q_VLAN_STATIC_UNTAGGED_PORTS, SwitchVlanState, VlanChangePlan
 
 
 def make_message_text(step: int = 1, **kwargs):
@@ -61,147 +57,113 @@ def make_message_text(step: int = 1, **kwargs):
     return text
 
 
-async def get_vlan_table(ip):
-    session = get_deviceapi_session()
-
-    async with session.get('/snmp/v2/walk', params={'ip': ip, 'oid': '1.3.6.1.2.1.17.7.1.4.3.1.2'}) as response:
-        result_all_ports = await response.json()
-
-    async with session.get('/snmp/v2/walk', params={'ip': ip, 'oid': '1.3.6.1.2.1.17.7.1.4.3.1.4'}) as response:
-        result_untagged_ports = await response.json()
-
-    await session.close()
-
-    untagged_ports = {
-        int(entry['oid'].split('.')[-1]): hex_to_portlist(entry['value'][2:])
-        for entry in result_untagged_ports['response']
-    }
+_port_list_sizes: dict[str, int] = {}
 
-    tagged_ports = {
-        entry['oid'].split('.')[-1]: hex_to_portlist(entry['value'][2:])
-        for entry in result_all_ports['response']
-    }
-    tagged_ports = {
-        int(vlan_id): [port for port in portlist if port not in untagged_ports[int(vlan_id)]]
-        for vlan_id, portlist in tagged_ports.items()
-    }
 
-    result = {'tagged': tagged_ports, 'untagged': untagged_ports}
-    return result
-
-
-async def get_port_vlan(ip, port):
-    vlans = await get_vlan_table(ip)
-    result = {
-        'tagged': [vlan_id for vlan_id, portlist in vlans['tagged'].items() if port in portlist],
-        'untagged': [vlan_id for vlan_id, portlist in vlans['untagged'].items() if port in portlist],
-    }
-    return result
-
-
-async def modify_port_vlan(ip,
-                           port,
-                           vlan,
-                           action: Literal['add', 'delete'],
-                           mode: Literal['tagged', 'untagged'] = None) -> None:
-    vlan_table = await get_vlan_table(ip)
-    tagged = vlan_table['tagged'][vlan]
-    untagged = vlan_table['untagged'][vlan]
-
-    if action == 'delete':
-        if port in tagged:
-            tagged.remove(port)
-        if port in untagged:
-            untagged.remove(port)
-    elif action == 'add':
-        if mode == 'tagged':
-            if port in untagged:
-                untagged.remove(port)
-            tagged.append(port)
-            tagged.sort()
-        elif mode == 'untagged':
-            if port in tagged:
-                tagged.remove(port)
-            untagged.append(port)
-            untagged.sort()
-
-    all_ = list(set(tagged) | set(untagged))
+async def get_vlan_table(ip) -> SwitchVlanState:
+    cache = get_vlan_cache()
+    state, version = await cache.get(ip)
+    if state is not None:
+        return state
 
     session = get_deviceapi_session()
 
-    async with session.get('/snmp/v2/walk', params={'ip': ip, 'oid': '1.3.6.1.2.1.17.7.1.4.3.1.2.1'}) as response:
-        answer = await response.json()
-    answer = answer['response'][0]['value']
-    hexlen = len(answer) - 2
-
-    await session.get('/snmp/v2/set',
-                      params={
-                          'ip': ip,
-                          'oid': '1.3.6.1.2.1.17.7.1.4.3.1.2.' + str(vlan),
-                          'value': portlist_to_hex(all_, hexlen),
-                      })
-    await session.get('/snmp/v2/set',
-                      params={
-                          'ip': ip,
-                          'oid': '1.3.6.1.2.1.17.7.1.4.3.1.4.' + str(vlan),
-                          'value': portlist_to_hex(untagged, hexlen),
-                      })
-    await session.close()
-
-
-async def ping(ip) -> bool:
+    async def walk(oid):
+        async with session.get('/snmp/v2/walk',
+                               params={'ip': ip, 'oid': oid}) as response:
+            return (await response.json())['response']
+
+    all_ports, untagged_ports = await asyncio.gather(
+        walk(DOT1Q_VLAN_STATIC_EGRESS_PORTS),
+        walk(DOT1Q_VLAN_STATIC_UNTAGGED_PORTS),
+    )
+    state = SwitchVlanState.from_walks(all_ports, untagged_ports,
+                                       size=_port_list_sizes.get(ip))
+    _port_list_sizes[ip] = state.size
+    await cache.put(ip, state, version)
+    return state
+
+
+async def apply_vlan_plan(ip, plan: VlanChangePlan) -> SwitchVlanState:
+    """Send the planned SETs; call with ``get_vlan_cache().lock(ip)`` held"""
+    cache = get_vlan_cache()
     session = get_deviceapi_session()
-    async with session.get('/ping/check', params={'ip': ip}) as response:
-        result = await response.json()
-    await session.close()
-    return result['response']['available']
-
-
-async def check_files_requested(ip) -> tuple[bool, bool]:
-    session = await get_ftp_session()
-    logfile = ''
-    async with session.download_stream('/tftp/tftp.log') as stream:
-        async for block in stream.iter_by_block():
-            logfile += block.decode('utf-8')
-    await session.quit()
-
-    firmware_requested, config_requested = False, False
-
-    logfile = filter(lambda x: x, logfile.split('\n'))
-    regex = r'(\d+\.\d+\.\d+\.\d+) filename (\S+)'
-
-    for line in logfile:
-        search = re.search(regex, line)
-        if not search:
-            continue
-        ip_, filename = search.groups()
-        if ip_ != ip:
-            continue
-        if 'firmwares' in filename:
-            firmware_requested = True
-        if 'configs' in filename:
-            config_requested = True
-
-    return firmware_requested, config_requested
-
-
-@current_app.task
-def ztp(ip: str,
+    try:
+        for oid, value in plan.changes():
+            async with session.get('/snmp/v2/set', params={
+                'ip': ip,
+                'oid': oid,
+                'value': value,
+            }) as response:
+                response.raise_for_status()
+                answer = await response.json()
+            # the device API reports SNMP failures in the body
+            if not isinstance(answer, dict) or 'response' not in answer \
+                    or answer.get('error') or answer.get('detail'):
+                raise RuntimeError(
+                    f'SNMP set {oid} on {ip} failed: {answer!r}')
+    except BaseException:
+        await cache.invalidate(ip)
+        raise
+    state = plan.result()
+    await cache.update(ip, state)
+    return state
+
+
+async def finish_entry(entry_id: int | None, ip: str) -> None:
+    """IN_PROGRESS -> DONE; repeating it for a finished entry is a no-op"""
+    settings = get_settings()
+    self_session = get_self_session()
+    if entry_id is None:
+        # task queued before entry ids were passed along
+        async with self_session.get('/entries/', params={
+            'status': 'IN_PROGRESS',
+            'ip_address': ip,
+        }) as response:
+            entries = await response.json()
+        entry_id = next(entry['id'] for entry in entries
+                        if entry['ip_address'] == ip)
+    if settings.PROJECT_DB:
+        async with get_project_db()() as db:
+            await crud.entry.transition_status(
+                db,
+                id=entry_id,
+                from_status=ZTPStatus.IN_PROGRESS,
+                to_status=ZTPStatus.DONE,
+                celery_id=None,
+                finished_at=datetime.datetime.now(),
+            )
+        return
+    async with self_session.post(f'/entries/{entry_id}/finish_ztp') as response:
+        await response.read()
+
+
+@current_app.task(bind=True)
+def ztp(self,
+        ip: str,
         autochange_vlan: bool = False,
         parent_switch: str = None,
         parent_port: str = None,
         management_vlan: str = None,
         push_full_config: bool = False,
         full_config_commands: list[str] = None,
-        full_config_filename: str = None):
-    asyncio.run(async_ztp(ip,
-                          autochange_vlan,
-                          parent_switch,
-                          parent_port,
-                          management_vlan,
-                          push_full_config,
-                          full_config_commands,
-                          full_config_filename))
+        full_config_filename: str = None,
+        entry_id: int = None):
+    try:
+        get_runner().run(async_ztp(ip,
+                                   autochange_vlan,
+                                   parent_switch,
+                                   parent_port,
+                                   management_vlan,
+                                   push_full_config,
+                                   full_config_commands,
+                                   full_config_filename,
+                                   entry_id,
+                                   task_id=self.request.id),
+                         task_id=self.request.id)
+    except concurrent.futures.CancelledError:
+        self.update_state(state=states.REVOKED)
+        raise Ignore()
 
 
 async def async_ztp(ip: str,
@@ -211,78 +173,114 @@ async def async_ztp(ip: str,
                     management_vlan: int = None,
                     push_full_config: bool = False,
                     full_config_commands: list[str] = None,
-                    full_config_filename: str = None):
-    bot = get_telegram_bot()
-    settings = get_settings()
-    chat_ids = settings.TELEGRAM_CHAT_IDS
-    message_ids = {}
+                    full_config_filename: str = None,
+                    entry_id: int = None,
+                    task_id: str = None):
+    notifier = get_notifier()
     message_params = {
         'ip': ip,
         'management_vlan': management_vlan,
         'autochange_vlan': autochange_vlan,
     }
-    for chat_id in chat_ids:
-        text = make_message_text(step=1, **message_params)
-        message = await bot.send_message(chat_id=chat_id, text=text)
-        message_ids[chat_id] = message.message_id
+
+    # one message per run: a restarted job must not edit the old one
+    notification_key = task_id or ip
+    current_step = 1
+
+    def report(step):
+        nonlocal current_step
+        current_step = step
+        notifier.update(notification_key,
+                        make_message_text(step=step, **message_params),
+                        final=step == 8)
+
+    # poll the TFTP log from the start: the switch may fetch its files
+    # before the job gets to wait for them
+    tailer = get_tftp_log_tailer()
+    tailer.follow()
+    outcome = 'Ошибка'
+    try:
+        await run_ztp_steps(ip, autochange_vlan, parent_switch, parent_port,
+                            management_vlan, push_full_config,
+                            full_config_commands, full_config_filename,
+                            entry_id, message_params, report)
+        outcome = None
+    except asyncio.CancelledError:
+        outcome = 'Остановлено'
+        raise
+    finally:
+        tailer.unfollow()
+        if current_step < 8:
+            text = make_message_text(step=current_step, **message_params)
+            if outcome:
+                text += outcome
+            notifier.update(notification_key, text, final=True)
+
+
+async def run_ztp_steps(ip: str,
+                        autochange_vlan: bool,
+                        parent_switch: str,
+                        parent_port: int,
+                        management_vlan: int,
+                        push_full_config: bool,
+                        full_config_commands: list[str],
+                        full_config_filename: str,
+                        entry_id: int,
+                        message_params: dict,
+                        report):
+    watcher = get_reachability_watcher()
+    started_at = datetime.datetime.now()
+    report(1)
     untagged = None
 
     if autochange_vlan:
         message_params['parent_switch'] = parent_switch
         message_params['parent_port'] = parent_port
-        for chat_id, message_id in message_ids.items():
-            await bot.edit_message_text(text=make_message_text(step=2, **message_params), chat_id=chat_id, message_id=message_id)
-        vlans_on_uplink = await get_port_vlan(parent_switch, parent_port)
-        untagged = vlans_on_uplink['untagged']
-        message_params['untagged'] = ', '.join(map(str, untagged))
-        for chat_id, message_id in message_ids.items():
-            await bot.edit_message_text(text=make_message_text(step=3, **message_params), chat_id=chat_id, message_id=message_id)
-        if untagged:
+        report(2)
+        async with get_vlan_cache().lock(parent_switch):
+            vlan_table = await get_vlan_table(parent_switch)
+            untagged = vlan_table.port_vlans(parent_port)['untagged']
+            message_params['untagged'] = ', '.join(map(str, untagged))
+            report(3)
+            plan = VlanChangePlan(vlan_table)
             for vlan in untagged:
-                await modify_port_vlan(parent_switch, parent_port, vlan, 'delete')
-        await modify_port_vlan(parent_switch, parent_port, management_vlan, 'delete')
-        await modify_port_vlan(parent_switch, parent_port, management_vlan, 'add', 'untagged')
+                plan.remove(parent_port, vlan)
+            plan.add(parent_port, management_vlan, 'untagged')
+            await apply_vlan_plan(parent_switch, plan)
     else:
         await asyncio.sleep(60)
 
-    for chat_id, message_id in message_ids.items():
-        await bot.edit_message_text(text=make_message_text(step=4, **message_params), chat_id=chat_id, message_id=message_id)
-    while not (await ping(ip)):
-        await asyncio.sleep(1)
-    for chat_id, message_id in message_ids.items():
-        await bot.edit_message_text(
-            text=make_message_text(step=5, **message_params), chat_id=chat_id,
-            message_id=message_id)
-
-    firmware_requested, config_requested = await check_files_requested(ip)
-    available = await ping(ip)
-    while not (firmware_requested and config_requested and not available):
-        await asyncio.sleep(1)
-        firmware_requested, config_requested = await check_files_requested(ip)
-        available = await ping(ip)
+    async def restore_uplink():
+        async with get_vlan_cache().lock(parent_switch):
+            plan = VlanChangePlan(await get_vlan_table(parent_switch))
+            plan.add(parent_port, management_vlan, 'tagged')
+            for vlan in untagged or []:
+                plan.add(parent_port, vlan, 'untagged')
+            await apply_vlan_plan(parent_switch, plan)
+
+    try:
+        report(4)
+        await watcher.wait_for(ip, available=True)
+        report(5)
+
+        await get_tftp_log_tailer().wait_for_files(
+            ip, since=started_at, timeout=get_settings().TFTP_WAIT_TIMEOUT)
+        await watcher.wait_for(ip, available=False)
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        # job was revoked or the switch never came for its files:
+        # give the uplink its customer vlans back
+        if autochange_vlan:
+            await restore_uplink()
+        raise
 
     if autochange_vlan:
-        for chat_id, message_id in message_ids.items():
-            await bot.edit_message_text(
-                text=make_message_text(step=6, **message_params),
-                chat_id=chat_id, message_id=message_id)
-
-        await modify_port_vlan(parent_switch, parent_port, management_vlan, 'delete')
-        await modify_port_vlan(parent_switch, parent_port, management_vlan, 'add', 'tagged')
-        if untagged:
-            for vlan in untagged:
-                await modify_port_vlan(parent_switch, parent_port, vlan, 'add', 'untagged')
-
-    for chat_id, message_id in message_ids.items():
-        await bot.edit_message_text(
-            text=make_message_text(step=7, **message_params), chat_id=chat_id,
-            message_id=message_id)
-    while not (await ping(ip)):
-        await asyncio.sleep(1)
-    for chat_id, message_id in message_ids.items():
-        await bot.edit_message_text(
-            text=make_message_text(step=8, **message_params), chat_id=chat_id,
-            message_id=message_id)
+        report(6)
+
+        await restore_uplink()
+
+    report(7)
+    await watcher.wait_for(ip, available=True)
+    report(8)
 
     if push_full_config:
         commands = []
@@ -312,15 +310,6 @@ async def async_ztp(ip: str,
             await session.post('/terminal/send_commands', json=request_data)
 
 
-    self_session = get_self_session()
-    async with self_session.get('/entries/', params={'status': 'IN_PROGRESS'}) as response:
-        response = await response.json()
-        response = list(filter(lambda x: x['ip_address'] == ip, response))[0]
-        entry_id = response['id']
-    await self_session.patch(f'/entries/{entry_id}', json={
-        'status': 'DONE',
-        'celery_id': None,
-        'finished_at': datetime.datetime.now().isoformat()
-    })
+    await finish_entry(entry_id, ip)
 
     # TODO изменение документации
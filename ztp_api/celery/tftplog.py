@@ -0,0 +1,189 @@
+import asyncio
+import datetime
+import logging
+import re
+
+from ztp_api.celery.dependencies import get_ftp_session, get_settings, \
+    loop_client
+
+
+logger = logging.getLogger(__name__)
+
+REQUEST_REGEX = re.compile(r'(\d+\.\d+\.\d+\.\d+) filename (\S+)')
+ISO_TIME_REGEX = re.compile(
+    r'^(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?'
+    r'(?:Z|[+-]\d{2}:?\d{2})?)'
+)
+SYSLOG_TIME_REGEX = re.compile(r'^([A-Z][a-z]{2} +\d{1,2} \d{2}:\d{2}:\d{2})')
+# tolerated difference between the worker and the TFTP server clocks
+CLOCK_SLACK = datetime.timedelta(seconds=30)
+
+
+def parse_log_time(line: str,
+                   now: datetime.datetime) -> datetime.datetime | None:
+    """Local time of a syslog line (RFC 3164 or ISO prefix), if it has one"""
+    search = ISO_TIME_REGEX.match(line)
+    if search:
+        try:
+            logged = datetime.datetime.fromisoformat(
+                search.group(1).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if logged.tzinfo is not None:
+            logged = logged.astimezone().replace(tzinfo=None)
+        return logged
+    search = SYSLOG_TIME_REGEX.match(line)
+    if search:
+        try:
+            logged = datetime.datetime.strptime(
+                f'{now.year} {search.group(1)}', '%Y %b %d %H:%M:%S')
+        except ValueError:
+            return None
+        # RFC 3164 has no year: a date ahead of us is from last year
+        if logged - now > datetime.timedelta(days=1):
+            logged = logged.replace(year=now.year - 1)
+        return logged
+    return None
+
+
+class TftpLogTailer:
+    """
+    Follows tftp.log by byte offset and keeps ip -> {firmware, config}
+    times of the latest requests, taken from the log lines. Lines without
+    a timestamp get the time of the previous poll (they were written
+    after it), or no usable time at all for the history read on start.
+    Jobs ``follow`` the log from their start, so polls stay current while
+    any job runs; nothing is polled while none does. Waiting jobs are
+    woken through a shared condition.
+    """
+
+    def __init__(self, path: str, interval: float = 1):
+        self.path = path
+        self.interval = interval
+        self.offset = 0
+        self.requests: dict[str, dict[str, datetime.datetime]] = {}
+        self._partial = b''
+        self._polled_at = datetime.datetime.min
+        self._waiters = 0
+        self._client = None
+        self._condition = asyncio.Condition()
+        self._task: asyncio.Task | None = None
+
+    def _parse_line(self, line: str, now: datetime.datetime) -> None:
+        search = REQUEST_REGEX.search(line)
+        if not search:
+            return
+        ip, filename = search.groups()
+        logged = parse_log_time(line, now) or self._polled_at
+        requested = self.requests.setdefault(ip, {})
+        for kind, marker in (('firmware', 'firmwares'), ('config', 'configs')):
+            if marker in filename:
+                requested[kind] = max(requested.get(kind, logged), logged)
+
+    def _feed(self, block: bytes, now: datetime.datetime) -> None:
+        lines = (self._partial + block).split(b'\n')
+        self._partial = lines.pop()
+        for line in lines:
+            self._parse_line(line.decode('utf-8', errors='replace'), now)
+
+    async def _close_client(self) -> None:
+        if self._client is not None:
+            client, self._client = self._client, None
+            try:
+                await client.quit()
+            except Exception:
+                client.close()
+
+    async def poll(self) -> None:
+        if self._client is None:
+            self._client = await get_ftp_session()
+        now = datetime.datetime.now()
+        info = await self._client.stat(self.path)
+        size = int(info['size'])
+        if size < self.offset:
+            # log was rotated or truncated
+            self.offset = 0
+            self._partial = b''
+        if size == self.offset:
+            self._polled_at = now
+            return
+        async with self._client.download_stream(self.path,
+                                                offset=self.offset) as stream:
+            async for block in stream.iter_by_block():
+                self.offset += len(block)
+                self._feed(block, now)
+        self._polled_at = now
+        async with self._condition:
+            self._condition.notify_all()
+
+    async def _run(self) -> None:
+        try:
+            while self._waiters:
+                try:
+                    await self.poll()
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception('Failed to read %s', self.path)
+                    await self._close_client()
+                await asyncio.sleep(self.interval)
+        finally:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def follow(self) -> None:
+        self._waiters += 1
+        self.start()
+
+    def unfollow(self) -> None:
+        self._waiters -= 1
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def files_requested(self, ip: str,
+                        since: datetime.datetime = None) -> tuple[bool, bool]:
+        requested = self.requests.get(ip, {})
+        since = since - CLOCK_SLACK if since else datetime.datetime.min
+        # history of unknown age (datetime.min) never counts
+        return tuple(requested.get(kind, datetime.datetime.min) > since
+                     for kind in ('firmware', 'config'))
+
+    async def _wait_for_files(self, ip: str,
+                              since: datetime.datetime) -> None:
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: all(self.files_requested(ip, since))
+            )
+
+    async def wait_for_files(self, ip: str,
+                             since: datetime.datetime = None,
+                             timeout: float = None) -> None:
+        """Until the switch requested both files at or after ``since``.
+        Raises asyncio.TimeoutError after ``timeout`` seconds."""
+        self.follow()
+        try:
+            await asyncio.wait_for(self._wait_for_files(ip, since), timeout)
+        finally:
+            self.unfollow()
+
+
+def get_tftp_log_tailer() -> TftpLogTailer:
+    settings = get_settings()
+    return loop_client(
+        'tftplog',
+        lambda: TftpLogTailer(settings.TFTP_LOG_PATH,
+                              settings.TFTP_LOG_POLL_INTERVAL),
+        lambda tailer: tailer.stop(),
+    )
@@ -0,0 +1,119 @@
+import asyncio
+import contextlib
+import json
+import time
+
+from redis import asyncio as aioredis
+from redis.exceptions import WatchError
+
+from ztp_api.celery.dependencies import get_settings, loop_client
+from ztp_api.common.vlans import SwitchVlanState
+
+
+class VlanTableCache:
+    """
+    Short-TTL per-device VLAN tables shared by the jobs of this worker, or
+    of every worker when backed by Redis. Each device has a version stamp
+    bumped by every write, so a walk that raced with a write is not cached
+    over the newer table.
+    """
+
+    def __init__(self, url: str = None, ttl: int = 30,
+                 lock_timeout: int = 120, prefix: str = 'ztp:vlans:'):
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.prefix = prefix
+        self.redis = aioredis.from_url(url) if url else None
+        self._tables: dict[str, tuple[float, SwitchVlanState]] = {}
+        self._versions: dict[str, int] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def _key(self, ip: str) -> str:
+        return f'{self.prefix}{ip}'
+
+    def _version_key(self, ip: str) -> str:
+        return f'{self.prefix}{ip}:version'
+
+    async def get(self, ip: str) -> tuple[SwitchVlanState | None, int]:
+        """Cached table (or None) and the device's current version"""
+        if self.redis is None:
+            expires, state = self._tables.get(ip, (0, None))
+            if expires < time.monotonic():
+                state = None
+            return state, self._versions.get(ip, 0)
+        data, version = await self.redis.mget(self._key(ip),
+                                              self._version_key(ip))
+        state = SwitchVlanState.from_dict(json.loads(data)) if data else None
+        return state, int(version or 0)
+
+    async def put(self, ip: str, state: SwitchVlanState,
+                  version: int) -> None:
+        """Cache a freshly read table unless the device was written since"""
+        if self.redis is None:
+            if self._versions.get(ip, 0) == version:
+                self._tables[ip] = (time.monotonic() + self.ttl, state)
+            return
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(self._version_key(ip))
+                if int(await pipe.get(self._version_key(ip)) or 0) != version:
+                    return
+                pipe.multi()
+                pipe.set(self._key(ip), json.dumps(state.to_dict()),
+                         ex=self.ttl)
+                await pipe.execute()
+            except WatchError:
+                pass
+
+    async def update(self, ip: str, state: SwitchVlanState) -> None:
+        """Store the table as just written to the device"""
+        if self.redis is None:
+            self._versions[ip] = self._versions.get(ip, 0) + 1
+            self._tables[ip] = (time.monotonic() + self.ttl, state)
+            return
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.incr(self._version_key(ip))
+            pipe.expire(self._version_key(ip), 86400)
+            pipe.set(self._key(ip), json.dumps(state.to_dict()), ex=self.ttl)
+            await pipe.execute()
+
+    async def invalidate(self, ip: str) -> None:
+        if self.redis is None:
+            self._versions[ip] = self._versions.get(ip, 0) + 1
+            self._tables.pop(ip, None)
+            return
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.incr(self._version_key(ip))
+            pipe.expire(self._version_key(ip), 86400)
+            pipe.delete(self._key(ip))
+            await pipe.execute()
+
+    @contextlib.asynccontextmanager
+    async def lock(self, ip: str):
+        """
+        Exclusive read-modify-write access to one device. Jobs of this
+        worker queue on a local lock; the Redis lock covers other workers.
+        """
+        local_lock = self._locks.setdefault(ip, asyncio.Lock())
+        async with local_lock:
+            if self.redis is None:
+                yield
+                return
+            async with self.redis.lock(f'{self.prefix}{ip}:lock',
+                                       timeout=self.lock_timeout):
+                yield
+
+    async def close(self) -> None:
+        if self.redis is not None:
+            await self.redis.close()
+
+
+def get_vlan_cache() -> VlanTableCache:
+    settings = get_settings()
+    return loop_client(
+        'vlancache',
+        lambda: VlanTableCache(settings.VLAN_CACHE_URL,
+                               ttl=settings.VLAN_CACHE_TTL,
+                               lock_timeout=settings.VLAN_CACHE_LOCK_TIMEOUT),
+        lambda cache: cache.close(),
+    )
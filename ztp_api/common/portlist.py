@@ -0,0 +1,82 @@
+from typing import Iterable
+
+
+class PortList:
+    """
+    dot1q PortList as an integer bitmask: port 1 is the most significant
+    bit of the first octet, as in the SNMP hex representation.
+    """
+    __slots__ = ('mask', 'size')
+
+    def __init__(self, size: int, ports: Iterable[int] = (), mask: int = 0):
+        self.size = size
+        self.mask = mask
+        for port in ports:
+            self.add(port)
+
+    @classmethod
+    def from_hex(cls, hexstring: str) -> 'PortList':
+        if hexstring[:2] in ('0x', '0X'):
+            hexstring = hexstring[2:]
+        return cls(len(hexstring) * 4, mask=int(hexstring or '0', 16))
+
+    def to_hex(self) -> str:
+        if not self.size:
+            return ''
+        return format(self.mask, f'0{self.size // 4}x')
+
+    def _bit(self, port: int) -> int:
+        if not 1 <= port <= self.size:
+            raise ValueError(f'Port {port} is out of range 1-{self.size}')
+        return 1 << (self.size - port)
+
+    def _aligned(self, other: 'PortList') -> tuple[int, int, int]:
+        if self.size >= other.size:
+            return self.size, self.mask, other.mask << (self.size - other.size)
+        return other.size, self.mask << (other.size - self.size), other.mask
+
+    def add(self, port: int) -> None:
+        self.mask |= self._bit(port)
+
+    def discard(self, port: int) -> None:
+        if 1 <= port <= self.size:
+            self.mask &= ~self._bit(port)
+
+    def copy(self) -> 'PortList':
+        return PortList(self.size, mask=self.mask)
+
+    def __contains__(self, port: int) -> bool:
+        return 1 <= port <= self.size and bool(self.mask >> (self.size - port) & 1)
+
+    def __iter__(self):
+        bits = format(self.mask, f'0{self.size}b')
+        return (index for index, bit in enumerate(bits, 1) if bit == '1')
+
+    def __len__(self) -> int:
+        return self.mask.bit_count()
+
+    def __bool__(self) -> bool:
+        return bool(self.mask)
+
+    def __or__(self, other: 'PortList') -> 'PortList':
+        size, left, right = self._aligned(other)
+        return PortList(size, mask=left | right)
+
+    def __and__(self, other: 'PortList') -> 'PortList':
+        size, left, right = self._aligned(other)
+        return PortList(size, mask=left & right)
+
+    def __sub__(self, other: 'PortList') -> 'PortList':
+        size, left, right = self._aligned(other)
+        return PortList(size, mask=left & ~right)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PortList):
+            return NotImplemented
+        _, left, right = self._aligned(other)
+        return left == right
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'PortList({self.size}, {list(self)})'
@@ -0,0 +1,82 @@
+import logging
+import os
+import threading
+from typing import Callable, Generic, TypeVar
+
+from pydantic import BaseSettings
+
+
+logger = logging.getLogger(__name__)
+
+SettingsType = TypeVar('SettingsType', bound=BaseSettings)
+
+
+class SettingsProvider(Generic[SettingsType]):
+    """
+    Parses the settings once and hands out the same instance. ``watch``
+    starts a daemon thread that re-parses the config file when its mtime
+    changes and swaps the instance in a single assignment; a file that
+    fails to parse keeps the previous settings.
+    """
+
+    def __init__(self, factory: Callable[[], SettingsType], config_env: str):
+        self.factory = factory
+        self.config_env = config_env
+        self._settings: SettingsType | None = None
+        self._mtime: int | None = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._thread_pid: int | None = None
+
+    def _config_mtime(self) -> int | None:
+        path = os.environ.get(self.config_env)
+        try:
+            return os.stat(path).st_mtime_ns if path else None
+        except OSError:
+            return None
+
+    def get(self) -> SettingsType:
+        settings = self._settings
+        if settings is None:
+            with self._lock:
+                if self._settings is None:
+                    self._mtime = self._config_mtime()
+                    self._settings = self.factory()
+                settings = self._settings
+        return settings
+
+    def reload(self) -> SettingsType:
+        with self._lock:
+            mtime = self._config_mtime()
+            settings = self.factory()
+            self._settings, self._mtime = settings, mtime
+        return settings
+
+    def _watch(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            if self._config_mtime() == self._mtime:
+                continue
+            try:
+                self.reload()
+                logger.info('Settings reloaded from %s',
+                            os.environ.get(self.config_env))
+            except Exception:
+                logger.exception('Keeping previous settings')
+                self._mtime = self._config_mtime()
+
+    def watch(self, interval: float = 5) -> None:
+        # threads do not survive fork, so a pool child starts its own
+        if self._thread is not None and self._thread_pid == os.getpid() \
+                and self._thread.is_alive():
+            return
+        self.get()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, args=(interval,),
+                                        name='settings-watch', daemon=True)
+        self._thread_pid = os.getpid()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
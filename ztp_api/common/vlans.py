@@ -0,0 +1,184 @@
+from typing import Literal
+
+from ztp_api.common.portlist import PortList
+
+
+DOT1Q_VLAN_STATIC_EGRESS_PORTS = '1.3.6.1.2.1.17.7.1.4.3.1.2'
+DOT1Q_VLAN_STATIC_UNTAGGED_PORTS = '1.3.6.1.2.1.17.7.1.4.3.1.4'
+
+
+def oid_index(oid: str) -> int:
+    return int(oid.split('.')[-1])
+
+
+class SwitchVlanState:
+    """
+    dot1q VLAN membership of one switch with both VLAN -> ports and
+    port -> VLANs indexes, built in a single pass over the port lists.
+    Port lists shorter than ``size`` (or than the longest one seen) are
+    padded, so every VLAN is written back at the device's full width.
+    """
+
+    def __init__(self,
+                 egress: dict[int, PortList],
+                 untagged: dict[int, PortList],
+                 names: dict[int, str] = None,
+                 size: int = None):
+        self.names = names or {}
+        self.size = max([size or 0] +
+                        [portlist.size for portlist in egress.values()] +
+                        [portlist.size for portlist in untagged.values()])
+        self.egress = {
+            vlan_id: self._padded(portlist)
+            for vlan_id, portlist in egress.items()
+        }
+        self.untagged = {
+            vlan_id: self._padded(untagged.get(vlan_id) or PortList(0))
+            for vlan_id in egress
+        }
+        self.tagged = {
+            vlan_id: portlist - self.untagged[vlan_id]
+            for vlan_id, portlist in egress.items()
+        }
+        self.port_tagged: dict[int, list[int]] = {}
+        self.port_untagged: dict[int, list[int]] = {}
+        for vlan_id in sorted(egress):
+            for port in self.tagged[vlan_id]:
+                self.port_tagged.setdefault(port, []).append(vlan_id)
+            for port in self.untagged[vlan_id]:
+                self.port_untagged.setdefault(port, []).append(vlan_id)
+
+    def _padded(self, portlist: PortList) -> PortList:
+        if portlist.size == self.size:
+            return portlist
+        return PortList(self.size,
+                        mask=portlist.mask << (self.size - portlist.size))
+
+    @classmethod
+    def from_walks(cls,
+                   egress_walk: list[dict],
+                   untagged_walk: list[dict],
+                   names_walk: list[dict] = (),
+                   size: int = None) -> 'SwitchVlanState':
+        egress = {oid_index(entry['oid']): PortList.from_hex(entry['value'])
+                  for entry in egress_walk}
+        untagged = {oid_index(entry['oid']): PortList.from_hex(entry['value'])
+                    for entry in untagged_walk}
+        names = {oid_index(entry['oid']): entry['value']
+                 for entry in names_walk}
+        return cls(egress, untagged, names, size)
+
+    def to_dict(self) -> dict:
+        return {
+            'size': self.size,
+            'egress': {str(vlan_id): portlist.to_hex()
+                       for vlan_id, portlist in self.egress.items()},
+            'untagged': {str(vlan_id): portlist.to_hex()
+                         for vlan_id, portlist in self.untagged.items()},
+            'names': {str(vlan_id): name
+                      for vlan_id, name in self.names.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SwitchVlanState':
+        egress = {int(vlan_id): PortList.from_hex(value)
+                  for vlan_id, value in data['egress'].items()}
+        untagged = {int(vlan_id): PortList.from_hex(value)
+                    for vlan_id, value in data['untagged'].items()}
+        names = {int(vlan_id): name
+                 for vlan_id, name in data.get('names', {}).items()}
+        return cls(egress, untagged, names, data.get('size'))
+
+    def port_vlans(self, port: int) -> dict[str, list[int]]:
+        return {
+            'tagged': list(self.port_tagged.get(port, [])),
+            'untagged': list(self.port_untagged.get(port, [])),
+        }
+
+    def port_settings(self, descriptions: list[dict]) -> dict[int, dict]:
+        """
+        ``original_port_settings`` shape for consecutive ports 1..N taken
+        from an ifAlias walk
+        """
+        result = {}
+        current_port = 0
+        for response in descriptions:
+            if oid_index(response['oid']) - current_port != 1:
+                break
+            current_port += 1
+            result[current_port] = {
+                'description': response['value'],
+                **self.port_vlans(current_port),
+            }
+        return result
+
+    def vlan_settings(self) -> dict[int, str]:
+        return dict(self.names)
+
+
+class VlanChangePlan:
+    """
+    Target egress/untagged port lists for the VLANs touched on one switch,
+    computed against a single SwitchVlanState read.
+    """
+
+    def __init__(self, state: SwitchVlanState):
+        self.state = state
+        self.egress: dict[int, PortList] = {}
+        self.untagged: dict[int, PortList] = {}
+
+    def _target(self, vlan: int) -> tuple[PortList, PortList]:
+        if vlan not in self.egress:
+            if vlan not in self.state.egress:
+                raise ValueError(f'VLAN {vlan} is not configured')
+            self.egress[vlan] = self.state.egress[vlan].copy()
+            self.untagged[vlan] = self.state.untagged[vlan].copy()
+        return self.egress[vlan], self.untagged[vlan]
+
+    def remove(self, port: int, vlan: int) -> None:
+        if vlan not in self.state.egress:
+            return
+        egress, untagged = self._target(vlan)
+        egress.discard(port)
+        untagged.discard(port)
+
+    def add(self, port: int, vlan: int,
+            mode: Literal['tagged', 'untagged'] = 'untagged') -> None:
+        egress, untagged = self._target(vlan)
+        egress.add(port)
+        if mode == 'untagged':
+            untagged.add(port)
+        else:
+            untagged.discard(port)
+
+    def changes(self) -> list[tuple[str, str]]:
+        """
+        (oid, hex value) SETs for the port lists that differ from the read
+        state. VLANs losing ports go first, and within a VLAN the untagged
+        list never holds a port missing from egress.
+        """
+        shrinking = []
+        growing = []
+        for vlan in sorted(self.egress):
+            egress, untagged = self.egress[vlan], self.untagged[vlan]
+            old_egress = self.state.egress[vlan]
+            old_untagged = self.state.untagged[vlan]
+            egress_set = untagged_set = None
+            if egress != old_egress:
+                egress_set = (f'{DOT1Q_VLAN_STATIC_EGRESS_PORTS}.{vlan}',
+                              egress.to_hex())
+            if untagged != old_untagged:
+                untagged_set = (f'{DOT1Q_VLAN_STATIC_UNTAGGED_PORTS}.{vlan}',
+                                untagged.to_hex())
+            if (egress - old_egress) or (untagged - old_untagged):
+                growing.extend(filter(None, (egress_set, untagged_set)))
+            else:
+                shrinking.extend(filter(None, (untagged_set, egress_set)))
+        return shrinking + growing
+
+    def result(self) -> SwitchVlanState:
+        """Switch state once the planned changes are applied"""
+        egress = {**self.state.egress, **self.egress}
+        untagged = {**self.state.untagged, **self.untagged}
+        return SwitchVlanState(egress, untagged, self.state.names,
+                               self.state.size)
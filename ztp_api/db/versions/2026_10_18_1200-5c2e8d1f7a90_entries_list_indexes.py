@@ -0,0 +1,33 @@
+"""entries list indexes
+
+Revision ID: 5c2e8d1f7a90
+Revises: ab9e8ff5d92d
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2e8d1f7a90'
+down_revision = 'ab9e8ff5d92d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_entries_created_at_id', 'entries', ['created_at', 'id'])
+    op.create_index('ix_entries_ip_address', 'entries', ['ip_address'])
+    op.create_index('ix_entries_serial_number', 'entries', ['serial_number'])
+    op.create_index('ix_entries_employee_id', 'entries', ['employee_id'])
+    op.create_index('ix_entries_in_progress', 'entries', ['created_at', 'id'],
+                    postgresql_where=sa.text("status = 'IN_PROGRESS'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_entries_in_progress', table_name='entries')
+    op.drop_index('ix_entries_employee_id', table_name='entries')
+    op.drop_index('ix_entries_serial_number', table_name='entries')
+    op.drop_index('ix_entries_ip_address', table_name='entries')
+    op.drop_index('ix_entries_created_at_id', table_name='entries')
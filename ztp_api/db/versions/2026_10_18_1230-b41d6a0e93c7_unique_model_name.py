@@ -0,0 +1,71 @@
+"""unique model name
+
+Revision ID: b41d6a0e93c7
+Revises: 5c2e8d1f7a90
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+import logging
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41d6a0e93c7'
+down_revision = '5c2e8d1f7a90'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def merge_requested() -> bool:
+    value = context.get_x_argument(as_dictionary=True).get(
+        'merge_duplicate_models', '')
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def upgrade() -> None:
+    if not context.is_offline_mode():
+        duplicates = op.get_bind().execute(sa.text(
+            'SELECT model, array_agg(id ORDER BY id) AS ids, '
+            'json_agg(models ORDER BY id) AS rows FROM models '
+            'GROUP BY model HAVING count(*) > 1 ORDER BY model'
+        )).all()
+        if duplicates and not merge_requested():
+            listing = '\n'.join(f'  {row.model}: ids {list(row.ids)}'
+                                 for row in duplicates)
+            raise RuntimeError(
+                'models has duplicate names:\n' + listing + '\n'
+                'Remove them by hand, or rerun with '
+                '"-x merge_duplicate_models=true" to repoint their entries '
+                'to the lowest id and delete the other rows.'
+            )
+        # the deleted rows are logged in full so they can be restored
+        for row in duplicates:
+            logger.warning('Merging model %r: ids %s into %s, deleting:',
+                           row.model, list(row.ids)[1:], row.ids[0])
+            for deleted in row.rows[1:]:
+                logger.warning('  %s', deleted)
+    if context.is_offline_mode() and not merge_requested():
+        # without the merge the index fails on duplicates, nothing is lost
+        op.create_index('ix_models_model', 'models', ['model'], unique=True)
+        return
+    # duplicates are merged into the lowest id, the row lookups used so far
+    op.execute(
+        'UPDATE entries SET model_id = duplicates.keep_id '
+        'FROM (SELECT id, min(id) OVER (PARTITION BY model) AS keep_id '
+        'FROM models) AS duplicates '
+        'WHERE entries.model_id = duplicates.id '
+        'AND duplicates.id <> duplicates.keep_id'
+    )
+    op.execute(
+        'DELETE FROM models USING models AS kept '
+        'WHERE models.model = kept.model AND models.id > kept.id'
+    )
+    op.create_index('ix_models_model', 'models', ['model'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_models_model', table_name='models')